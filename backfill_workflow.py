@@ -0,0 +1,236 @@
+# ====================================
+# WORKFLOW: CARGA HISTORICA (BACKFILL)
+# ====================================
+
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from database_manager import DatabaseManager
+from data_collector import B3DataCollector
+from cotahist_parser import FiltroCotahist
+from config import B3_CONFIG, BACKFILL_CONFIG, calcular_d1, get_cotahist_url
+
+# Configurar logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def _processar_ano(tarefa):
+    """Baixa, processa e transforma um arquivo anual (executa em outro processo)"""
+    ano, data_inicio, data_fim = tarefa
+
+    filtro = FiltroCotahist(**B3_CONFIG.get('filtro_cotahist', {})).com_datas(data_inicio, data_fim)
+    collector = B3DataCollector(parse_workers=1, filtro=filtro)
+
+    zip_file = collector.download_cotahist(get_cotahist_url(ano), pular_ingerido=False)
+    if zip_file is None:
+        return ano, None, None
+
+    if collector.usa_parquet(zip_file):
+        # Ano ja processado com o mesmo arquivo: le do dataset Parquet em vez de refazer o parse
+        df_transformed = collector.carregar_processado(zip_file)
+    else:
+        df_raw = collector.parse_csv_data(zip_file)
+        if df_raw.empty:
+            return ano, None, None
+        df_transformed = collector.transform_data(collector.filter_d1_data(df_raw))
+
+    if df_transformed.empty:
+        return ano, None, None
+
+    return ano, df_transformed, collector.extract_ativos(df_transformed)
+
+
+class ManifestoBackfill:
+    """Registro dos anos e datas ja carregados, para retomar apos falhas"""
+
+    def __init__(self, caminho=None):
+        self.caminho = caminho or BACKFILL_CONFIG['manifesto']
+        os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+        self.anos = self._carregar()
+
+    def _carregar(self):
+        """Carrega o manifesto gravado"""
+        try:
+            with open(self.caminho, 'r', encoding='utf-8') as arquivo:
+                return json.load(arquivo).get('anos', {})
+        except FileNotFoundError:
+            return {}
+
+    def _salvar(self):
+        """Grava o manifesto de forma atomica"""
+        temporario = self.caminho + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump({'anos': self.anos}, arquivo, indent=2)
+        os.replace(temporario, self.caminho)
+
+    def pendente(self, ano, data_inicio, data_fim):
+        """Retorna o intervalo ainda nao carregado do ano, ou None se ja concluido"""
+        entrada = self.anos.get(str(ano))
+        if entrada:
+            coberto_inicio = date.fromisoformat(entrada['inicio'])
+            coberto_fim = date.fromisoformat(entrada['fim'])
+            if coberto_inicio <= data_inicio and coberto_fim >= data_fim:
+                return None
+            if coberto_inicio <= data_inicio <= coberto_fim:
+                data_inicio = coberto_fim + timedelta(days=1)
+        return data_inicio, data_fim
+
+    def concluir(self, ano, data_inicio, data_fim, datas, registros):
+        """Registra o intervalo do ano como carregado
+
+        Une com o intervalo ja registrado quando os dois se sobrepoem ou sao adjacentes;
+        um intervalo disjunto substitui o registrado (o manifesto guarda um intervalo por ano).
+        """
+        entrada = self.anos.get(str(ano))
+        if (entrada
+                and date.fromisoformat(entrada['fim']) >= data_inicio - timedelta(days=1)
+                and date.fromisoformat(entrada['inicio']) <= data_fim + timedelta(days=1)):
+            data_inicio = min(data_inicio, date.fromisoformat(entrada['inicio']))
+            data_fim = max(data_fim, date.fromisoformat(entrada['fim']))
+            datas = sorted(set(entrada['datas']) | set(datas))
+            registros += entrada['registros']
+
+        self.anos[str(ano)] = {
+            'inicio': data_inicio.isoformat(),
+            'fim': data_fim.isoformat(),
+            'datas': sorted(datas),
+            'registros': registros,
+            'concluido_em': datetime.now().isoformat(timespec='seconds')
+        }
+        self._salvar()
+
+
+class BackfillWorkflow:
+    """Workflow para carga historica de varios anos do COTAHIST"""
+
+    def __init__(self, workers=None, manifesto=None):
+        self.db_manager = DatabaseManager()
+        self.data_collector = B3DataCollector()
+        self.workers = workers or BACKFILL_CONFIG.get('workers', 4)
+        self.manifesto = manifesto or ManifestoBackfill()
+
+    def execute(self, data_inicio, data_fim=None):
+        """Carrega as cotacoes entre as datas, um processo por arquivo anual"""
+        try:
+            data_fim = data_fim or calcular_d1()
+            logger.info(f"=== INICIANDO BACKFILL DE {data_inicio} A {data_fim} ===")
+
+            if not self.db_manager.test_connection():
+                return False
+
+            if not self.db_manager.check_and_create_tables():
+                return False
+
+            tarefas = self._planejar(data_inicio, data_fim)
+            if not tarefas:
+                logger.info("Todos os anos do intervalo ja foram carregados")
+                return True
+
+            sucesso = True
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(tarefas))) as executor:
+                futuros = {executor.submit(_processar_ano, tarefa): tarefa for tarefa in tarefas}
+
+                # Um unico escritor: os anos sao gravados na ordem em que ficam prontos
+                for futuro in as_completed(futuros):
+                    ano, inicio, fim = futuros[futuro]
+                    try:
+                        _, df_transformed, df_ativos = futuro.result()
+                    except Exception as e:
+                        logger.error(f"Erro ao processar {ano}: {e}")
+                        sucesso = False
+                        continue
+
+                    if df_transformed is None:
+                        logger.warning(f"Nenhuma cotacao obtida para {ano}")
+                        sucesso = False
+                        continue
+
+                    if not self._gravar_ano(ano, inicio, fim, df_transformed, df_ativos):
+                        sucesso = False
+
+            if sucesso:
+                logger.info("=== BACKFILL CONCLUIDO COM SUCESSO ===")
+            else:
+                logger.warning("=== BACKFILL CONCLUIDO COM FALHAS (execute novamente para retomar) ===")
+            return sucesso
+
+        except Exception as e:
+            logger.error(f"Erro no backfill: {e}")
+            return False
+
+    def _planejar(self, data_inicio, data_fim):
+        """Monta as tarefas (ano, inicio, fim) que ainda nao constam no manifesto"""
+        tarefas = []
+        for ano in range(data_inicio.year, data_fim.year + 1):
+            inicio = max(data_inicio, date(ano, 1, 1))
+            fim = min(data_fim, date(ano, 12, 31))
+
+            pendente = self.manifesto.pendente(ano, inicio, fim)
+            if pendente is None:
+                logger.info(f"{ano}: ja carregado, pulando")
+                continue
+
+            tarefas.append((ano, *pendente))
+            logger.info(f"{ano}: pendente de {pendente[0]} a {pendente[1]}")
+        return tarefas
+
+    def _gravar_ano(self, ano, data_inicio, data_fim, df_transformed, df_ativos):
+        """Grava ativos e cotacoes de um ano e registra no manifesto"""
+        try:
+            # Cadastrar apenas ativos novos: nomes antigos nao sobrescrevem os atuais
+            mapa = self.db_manager.get_mapa_ativos(df_ativos['codigo'])
+            df_ativos = df_ativos[~mapa.contem(df_ativos['codigo'])]
+            codigos_ano = df_transformed['codigo'].unique()
+            if self.db_manager.sync_ativos(df_ativos, remover_inativos=False, codigos_atuais=codigos_ano) is None:
+                return False
+
+            df_cotacoes = self.data_collector.prepare_cotacoes(df_transformed, self.db_manager.mapa_ativos)
+            if df_cotacoes.empty:
+                logger.warning(f"{ano}: nenhuma cotacao valida")
+                return False
+
+            if not self.db_manager.insert_cotacoes(df_cotacoes):
+                return False
+
+            datas = sorted(df_transformed['data'].dt.strftime('%Y-%m-%d').unique())
+            self.manifesto.concluir(ano, data_inicio, data_fim, datas, len(df_cotacoes))
+            logger.info(f"{ano}: {len(df_cotacoes)} cotacoes em {len(datas)} datas carregadas")
+            return True
+
+        except Exception as e:
+            logger.error(f"Erro ao gravar {ano}: {e}")
+            return False
+
+
+def interpretar_data(valor, fim_do_ano=False):
+    """Converte 'AAAA' ou 'AAAA-MM-DD' em data"""
+    if len(valor) == 4 and valor.isdigit():
+        return date(int(valor), 12, 31) if fim_do_ano else date(int(valor), 1, 1)
+    return date.fromisoformat(valor)
+
+
+def main():
+    """Funcao principal para execucao standalone: backfill_workflow.py INICIO [FIM]"""
+    if len(sys.argv) < 2:
+        print("Uso: python backfill_workflow.py INICIO [FIM]  (AAAA ou AAAA-MM-DD)")
+        sys.exit(1)
+
+    data_inicio = interpretar_data(sys.argv[1])
+    data_fim = interpretar_data(sys.argv[2], fim_do_ano=True) if len(sys.argv) > 2 else None
+    if data_fim:
+        data_fim = min(data_fim, calcular_d1())
+
+    if BackfillWorkflow().execute(data_inicio, data_fim):
+        sys.exit(0)
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+# ====================================
+# BENCHMARKS DE DESEMPENHO
+# ====================================
+
+import argparse
+import logging
+import random
+import time
+import tracemalloc
+from datetime import date, timedelta
+from io import BytesIO
+from zipfile import ZipFile, ZIP_DEFLATED
+
+import numpy as np
+import pandas as pd
+
+from cotahist_parser import FiltroCotahist
+from data_collector import B3DataCollector
+
+# Configurar logging (benchmarks ficam silenciosos, exceto avisos)
+logging.basicConfig(level=logging.WARNING)
+logging.getLogger().setLevel(logging.WARNING)
+logger = logging.getLogger(__name__)
+
+TICKERS_EXEMPLO = [
+    ('PETR4', 'PETROBRAS'), ('VALE3', 'VALE'), ('ITUB4', 'ITAUUNIBANCO'),
+    ('BBDC4', 'BRADESCO'), ('HGLG11', 'CSHG LOGISTICA'), ('XPML11', 'XP MALLS'),
+    ('BOVA11', 'ISHARES BOVA'), ('AAPL34', 'APPLE'), ('MGLU3', 'MAGAZ LUIZA'),
+    ('ABEV3', 'AMBEV S/A'), ('WEGE3', 'WEG'), ('SUZB3', 'SUZANO S.A.'),
+]
+
+
+def _campo_invalido(valor, indice):
+    """Estraga alguns campos numericos: vazio, com letras ou alinhado com espacos"""
+    if indice % 97 == 0:
+        return ' ' * len(valor)
+    if indice % 89 == 0:
+        return valor[:-6] + 'ABC' + valor[-3:]
+    if indice % 83 == 0:
+        return valor.lstrip('0').rjust(len(valor))
+    return valor
+
+
+def _registro_cotahist(dia, codigo, nome, rng, indice=None):
+    """Monta um registro 01 do COTAHIST com valores aleatorios (com indice, alguns campos invalidos)"""
+    preco = rng.randint(100, 100000)
+    registro = (
+        '01'
+        + dia.strftime('%Y%m%d')
+        + '02'
+        + codigo.ljust(12)
+        + '010'
+        + nome.ljust(12)[:12]
+        + 'ON      NM'
+        + '   '
+        + 'R$  '
+        + f'{preco:013d}'
+        + f'{preco + rng.randint(0, 500):013d}'
+        + f'{max(preco - rng.randint(0, 500), 1):013d}'
+        + f'{preco:013d}'
+        + f'{preco + rng.randint(-200, 200):013d}'
+        + f'{preco:013d}'
+        + f'{preco:013d}'
+        + f'{rng.randint(1, 99999):05d}'
+        + f'{rng.randint(1, 10 ** 9):018d}'
+        + f'{rng.randint(1, 10 ** 12):018d}'
+        + f'{0:013d}'
+        + '0'
+        + '99991231'
+        + '0000001'
+        + f'{0:013d}'
+        + 'BRPETRACNPR6'
+        + '100'
+    )
+    if indice is None:
+        return registro
+
+    # PREABE (56-69) e PREMIN (82-95); PREULT fica valido para o registro passar na transformacao
+    for inicio in (56, 82):
+        campo = _campo_invalido(registro[inicio:inicio + 13], indice + inicio)
+        registro = registro[:inicio] + campo + registro[inicio + 13:]
+    return registro
+
+
+def gerar_cotahist_sintetico(n_registros, ano=2024, seed=42, campos_invalidos=False):
+    """Gera o conteudo de um COTAHIST anual sintetico (com cabecalho e trailer)
+
+    campos_invalidos: inclui precos vazios, com letras e alinhados com espacos (viram NA nos dois engines).
+    """
+    rng = random.Random(seed)
+    linhas = [('00COTAHIST.' + str(ano) + 'BOVESPA ' + f'{ano}0102').ljust(245)]
+
+    dia = date(ano, 1, 2)
+    gerados = 0
+    while gerados < n_registros:
+        if dia.weekday() < 5:
+            for i in range(min(200, n_registros - gerados)):
+                codigo, nome = TICKERS_EXEMPLO[i % len(TICKERS_EXEMPLO)]
+                codigo = codigo if i < len(TICKERS_EXEMPLO) else f'{codigo[:4]}{i:03d}'[:12]
+                linhas.append(_registro_cotahist(dia, codigo, nome, rng,
+                                                 gerados if campos_invalidos else None))
+                gerados += 1
+        dia += timedelta(days=1)
+
+    linhas.append(('99COTAHIST.' + str(ano) + 'BOVESPA ' + f'{ano}1231'
+                   + f'{len(linhas) + 1:011d}').ljust(245))
+    return ('\r\n'.join(linhas) + '\r\n').encode('latin1')
+
+
+def _zip_em_memoria(conteudo):
+    """Empacota o conteudo em um ZIP como o publicado pela B3"""
+    buffer = BytesIO()
+    with ZipFile(buffer, 'w', ZIP_DEFLATED) as zip_file:
+        zip_file.writestr('COTAHIST_A2024.TXT', conteudo)
+    buffer.seek(0)
+    return ZipFile(buffer)
+
+
+def _medir(funcao):
+    """Executa a funcao medindo tempo e pico de memoria alocada"""
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = funcao()
+    duracao = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultado, duracao, pico
+
+
+def benchmark_parser(n_registros, workers=1):
+    """Compara os engines fwf e numpy no pipeline parse -> filtro -> transformacao"""
+    # Campos vazios/invalidos conferem que os dois engines devolvem NA (nao zero)
+    conteudo = gerar_cotahist_sintetico(n_registros, campos_invalidos=True)
+    zip_file = _zip_em_memoria(conteudo)
+    resultados = {}
+
+    for engine in ['fwf', 'numpy']:
+        collector = B3DataCollector(parser_engine=engine)
+
+        def pipeline():
+            df_raw = collector.parse_csv_data(zip_file)
+            df_filtrado = collector.filter_d1_data(df_raw)
+            return collector.transform_data(df_filtrado)
+
+        df, duracao, pico = _medir(pipeline)
+        resultados[engine] = (df, duracao, pico)
+
+        if workers > 1:
+            collector_paralelo = B3DataCollector(parser_engine=engine, parse_workers=workers)
+            df, duracao, pico = _medir(lambda: collector_paralelo.parse_sharded(zip_file))
+            pd.testing.assert_frame_equal(resultados[engine][0], df)
+            resultados[f'{engine} x{workers}'] = (df, duracao, pico)
+
+    print(f"\nBENCHMARK PARSER COTAHIST ({n_registros} registros, {len(conteudo) / 1e6:.1f} MB)")
+    print("=" * 60)
+    for engine, (df, duracao, pico) in resultados.items():
+        print(f"{engine:10s}: {duracao:8.2f} s | pico {pico / 1e6:8.1f} MB | {len(df)} linhas")
+
+    colunas = ['codigo', 'nome', 'data', 'preco_abertura', 'maximo', 'minimo',
+               'preco_medio', 'preco_fechamento', 'negocios', 'volume_financeiro']
+    df_fwf = resultados['fwf'][0][colunas].reset_index(drop=True)
+    df_numpy = resultados['numpy'][0][colunas].reset_index(drop=True)
+    pd.testing.assert_frame_equal(df_fwf, df_numpy, check_dtype=False)
+    print("Resultados identicos entre os engines")
+    return resultados
+
+
+def _transformar_sem_compactar(df):
+    """Transformacao anterior aos tipos compactos: texto object, precos float64 em reais"""
+    df = df.rename(columns={
+        'CODNEG': 'codigo', 'NOMRES': 'nome', 'PREABE': 'preco_abertura', 'PREMAX': 'maximo',
+        'PREMIN': 'minimo', 'PREMED': 'preco_medio', 'PREULT': 'preco_fechamento',
+        'QUATOTNEG': 'negocios', 'VOLTOT': 'volume_financeiro', 'DATA': 'data'
+    })
+    categoricas = [coluna for coluna in df.columns if isinstance(df[coluna].dtype, pd.CategoricalDtype)]
+    df = df.astype({coluna: object for coluna in categoricas})
+    df['codigo'] = df['codigo'].astype(str).str.strip()
+    df['nome'] = df['nome'].astype(str).str.strip()
+    for coluna in ['preco_abertura', 'maximo', 'minimo', 'preco_medio', 'preco_fechamento', 'volume_financeiro']:
+        df[coluna] = pd.to_numeric(df[coluna], errors='coerce').astype('float64') / 100
+    df['negocios'] = pd.to_numeric(df['negocios'], errors='coerce').astype('float64')
+    return df[(df['preco_fechamento'] > 0) | (df['preco_abertura'] > 0)]
+
+
+def benchmark_memoria(n_registros, engine='numpy'):
+    """Pico de memoria do pipeline completo de um ano (cenario do backfill), antes e depois dos tipos compactos
+
+    A linha de base refaz a transformacao com texto object e precos float64 em reais
+    (o parse e o mesmo nos dois casos).
+    """
+    conteudo = gerar_cotahist_sintetico(n_registros)
+    zip_file = _zip_em_memoria(conteudo)
+    collector = B3DataCollector(
+        parser_engine=engine,
+        filtro=FiltroCotahist(date(2024, 1, 1), date(2024, 12, 31))
+    )
+    collector.checkpoints = None
+
+    def pipeline(transformar):
+        df_transformed = transformar(collector.filter_d1_data(collector.parse_csv_data(zip_file)))
+        df_ativos = collector.extract_ativos(df_transformed)
+        ativos_db = pd.DataFrame({
+            'id': np.arange(1, len(df_ativos) + 1),
+            'codigo': df_ativos['codigo'].astype(str).to_numpy()
+        })
+        return df_transformed, df_ativos, collector.prepare_cotacoes(df_transformed, ativos_db)
+
+    resultados = {}
+    for modo, transformar in [('float64/object', _transformar_sem_compactar),
+                              ('compacto', collector.transform_data)]:
+        frames, duracao, pico = _medir(lambda: pipeline(transformar))
+        resultados[modo] = (frames, duracao, pico)
+
+    print(f"\nBENCHMARK MEMORIA DO PIPELINE ({n_registros} registros, engine {engine})")
+    print("=" * 60)
+    for modo, ((df_transformed, df_ativos, df_cotacoes), duracao, pico) in resultados.items():
+        print(f"{modo:15s}: {duracao:8.2f} s | pico alocado {pico / 1e6:8.1f} MB")
+        for nome, df in [('transformado', df_transformed), ('ativos', df_ativos), ('cotacoes', df_cotacoes)]:
+            print(f"  {nome:12s}: {df.memory_usage(deep=True).sum() / 1e6:8.1f} MB | {len(df)} linhas")
+
+    pico_base, pico_compacto = resultados['float64/object'][2], resultados['compacto'][2]
+    print(f"Reducao do pico: {(1 - pico_compacto / pico_base) * 100:.1f}%")
+    return {modo: pico for modo, (_, _, pico) in resultados.items()}
+
+
+# Resultado no formato de cotacoes gerado no servidor (sem depender dos dados carregados)
+CONSULTA_SINTETICA = """
+    SELECT (g %% 500)::int AS id_ativo,
+           DATE '2000-01-03' + (g / 500)::int AS data,
+           ((g %% 9973) / 100.0)::numeric(18,4) AS preco_abertura,
+           ((g %% 9967) / 100.0)::numeric(18,4) AS preco_fechamento,
+           ((g %% 9949) / 100.0)::numeric(18,4) AS maximo,
+           ((g %% 9941) / 100.0)::numeric(18,4) AS minimo,
+           (g %% 5000)::int AS negocios,
+           ((g %% 99991) * 10.5)::numeric(20,2) AS volume_financeiro
+    FROM generate_series(1, %s) AS g
+"""
+
+
+def benchmark_consulta(tamanhos):
+    """Compara pd.read_sql, o caminho tipado (COPY) de execute_query e iter_query"""
+    from database_manager import DatabaseManager
+    db = DatabaseManager()
+
+    print("\nBENCHMARK MATERIALIZACAO DE CONSULTAS (read_sql x COPY tipado)")
+    print("=" * 60)
+    resultados = {}
+    for linhas in tamanhos:
+        for modo, tipado in [('read_sql', False), ('copy', True)]:
+            df, duracao, pico = _medir(lambda: db.execute_query(CONSULTA_SINTETICA, (linhas,), tipado=tipado))
+            memoria = df.memory_usage(deep=True).sum()
+            resultados[(linhas, modo)] = (duracao, pico, memoria)
+            print(f"{linhas:>10,d} linhas | {modo:8s}: {duracao:8.2f} s | pico {pico / 1e6:8.1f} MB | "
+                  f"frame {memoria / 1e6:8.1f} MB")
+            del df
+
+        # Cursor do servidor: pico limitado a um lote, qualquer que seja o total
+        total, duracao, pico = _medir(lambda: sum(len(lote) for lote in db.iter_query(CONSULTA_SINTETICA, (linhas,))))
+        resultados[(linhas, 'iter')] = (duracao, pico, None)
+        print(f"{linhas:>10,d} linhas | {'iter':8s}: {duracao:8.2f} s | pico {pico / 1e6:8.1f} MB | {total} linhas em lotes")
+    return resultados
+
+
+def main():
+    """Funcao principal dos benchmarks"""
+    parser = argparse.ArgumentParser(description='Benchmarks do Sistema B3')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    parser_parser = subparsers.add_parser('parser', help='Compara engines de leitura do COTAHIST')
+    parser_parser.add_argument('--registros', type=int, default=200000)
+    parser_parser.add_argument('--workers', type=int, default=1,
+                               help='Inclui o parse paralelo com N processos')
+
+    parser_memoria = subparsers.add_parser('memoria', help='Pico de memoria do pipeline de um ano (float64/object x compacto)')
+    parser_memoria.add_argument('--registros', type=int, default=1000000)
+    parser_memoria.add_argument('--engine', choices=['fwf', 'numpy'], default='numpy')
+
+    parser_consulta = subparsers.add_parser('consulta', help='Compara read_sql e COPY tipado (requer o banco)')
+    parser_consulta.add_argument('--linhas', type=int, nargs='+', default=[10000, 1000000, 10000000])
+
+    args = parser.parse_args()
+
+    if args.benchmark == 'parser':
+        benchmark_parser(args.registros, args.workers)
+    elif args.benchmark == 'memoria':
+        benchmark_memoria(args.registros, args.engine)
+    elif args.benchmark == 'consulta':
+        benchmark_consulta(args.linhas)
+
+
+if __name__ == "__main__":
+    main()
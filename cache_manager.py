@@ -0,0 +1,249 @@
+# ====================================
+# MODULO: CACHE DE ARQUIVOS DA B3
+# ====================================
+
+import hashlib
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from config import CACHE_CONFIG
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def calcular_sha256(caminho):
+    """Calcula o hash SHA-256 de um arquivo em blocos"""
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(1024 * 1024), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def _travar(arquivo):
+    """Trava exclusiva do arquivo entre processos (espera a liberacao)"""
+    if fcntl is not None:
+        fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX)
+    else:
+        arquivo.seek(0)
+        msvcrt.locking(arquivo.fileno(), msvcrt.LK_LOCK, 1)
+
+
+def _destravar(arquivo):
+    """Libera a trava obtida com _travar"""
+    if fcntl is not None:
+        fcntl.flock(arquivo.fileno(), fcntl.LOCK_UN)
+    else:
+        arquivo.seek(0)
+        msvcrt.locking(arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class CacheManager:
+    """Cache local dos arquivos COTAHIST, indexado pela URL"""
+
+    def __init__(self, diretorio=None, max_bytes=None):
+        self.diretorio = diretorio or CACHE_CONFIG['diretorio']
+        self.max_bytes = max_bytes or CACHE_CONFIG['max_bytes']
+        self.caminho_indice = os.path.join(self.diretorio, 'indice.json')
+        os.makedirs(self.diretorio, exist_ok=True)
+        self.indice = self._carregar_indice()
+        self._travado = False
+
+    def _carregar_indice(self):
+        """Carrega o indice do cache (URL -> metadados)"""
+        try:
+            with open(self.caminho_indice, 'r', encoding='utf-8') as arquivo:
+                return json.load(arquivo)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Indice do cache invalido, recriando: {e}")
+            return {}
+
+    def _salvar_indice(self):
+        """Grava o indice de forma atomica"""
+        temporario = self.caminho_indice + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(self.indice, arquivo, indent=2)
+        os.replace(temporario, self.caminho_indice)
+
+    @contextmanager
+    def _indice_travado(self):
+        """Read-modify-write do indice sob trava de arquivo: recarrega do disco e grava ao sair
+
+        Cada processo do backfill tem seu CacheManager; sem recarregar, o indice em memoria
+        sobrescreveria as entradas registradas pelos outros. Reentrante na mesma instancia.
+        """
+        if self._travado:
+            yield self.indice
+            return
+
+        with open(self.caminho_indice + '.lock', 'a+b') as trava:
+            _travar(trava)
+            self._travado = True
+            try:
+                self.indice = self._carregar_indice()
+                yield self.indice
+                self._salvar_indice()
+            finally:
+                self._travado = False
+                _destravar(trava)
+
+    def _nome_arquivo(self, url):
+        """Nome do arquivo em cache derivado da URL"""
+        nome = os.path.basename(url.split('?')[0]) or 'arquivo.zip'
+        prefixo = hashlib.sha1(url.encode('utf-8')).hexdigest()[:10]
+        return f"{prefixo}_{nome}"
+
+    def entrada(self, url):
+        """Retorna os metadados da URL se o arquivo ainda estiver no cache"""
+        entrada = self.indice.get(url)
+        if entrada and os.path.exists(os.path.join(self.diretorio, entrada['arquivo'])):
+            return entrada
+        return None
+
+    def caminho(self, url):
+        """Caminho do arquivo em cache para a URL"""
+        entrada = self.entrada(url)
+        if entrada is None:
+            return None
+        return os.path.join(self.diretorio, entrada['arquivo'])
+
+    def caminho_temporario(self, url):
+        """Caminho para o download em andamento da URL"""
+        return os.path.join(self.diretorio, self._nome_arquivo(url) + '.part')
+
+    def headers_condicionais(self, url):
+        """Headers If-None-Match / If-Modified-Since para o GET condicional"""
+        entrada = self.entrada(url)
+        headers = {}
+        if entrada:
+            if entrada.get('etag'):
+                headers['If-None-Match'] = entrada['etag']
+            if entrada.get('last_modified'):
+                headers['If-Modified-Since'] = entrada['last_modified']
+        return headers
+
+    def registrar(self, url, caminho_temporario, etag=None, last_modified=None):
+        """Move o download concluido para o cache e atualiza o indice"""
+        nome = self._nome_arquivo(url)
+        destino = os.path.join(self.diretorio, nome)
+        os.replace(caminho_temporario, destino)
+
+        sha256 = calcular_sha256(destino)
+
+        # Outro processo (ex.: backfill) pode ter gravado o indice nesse meio tempo
+        with self._indice_travado():
+            anterior = self.indice.get(url, {})
+            self.indice[url] = {
+                'arquivo': nome,
+                'etag': etag,
+                'last_modified': last_modified,
+                'sha256': sha256,
+                'tamanho': os.path.getsize(destino),
+                'baixado_em': time.time(),
+                'ultimo_acesso': time.time(),
+                'sha256_ingerido': anterior.get('sha256_ingerido')
+            }
+            self.evict(manter=url)
+
+        logger.info(f"Arquivo registrado no cache: {nome} ({self.indice[url]['tamanho']} bytes)")
+        return destino
+
+    def tocar(self, url):
+        """Atualiza o ultimo acesso da URL (usado pela politica de remocao)"""
+        with self._indice_travado():
+            if url in self.indice:
+                self.indice[url]['ultimo_acesso'] = time.time()
+
+    def ja_ingerido(self, url):
+        """Indica se o arquivo em cache ja foi carregado com sucesso no banco"""
+        entrada = self.entrada(url)
+        return bool(entrada) and entrada.get('sha256') == entrada.get('sha256_ingerido')
+
+    def marcar_ingerido(self, url, sha256):
+        """Registra o hash do arquivo carregado com sucesso no banco"""
+        with self._indice_travado():
+            if url in self.indice:
+                self.indice[url]['sha256_ingerido'] = sha256
+
+    def tamanho_total(self):
+        """Soma do tamanho dos arquivos em cache"""
+        return sum(entrada.get('tamanho', 0) for entrada in self.indice.values())
+
+    def evict(self, manter=None):
+        """Remove os arquivos menos acessados ate respeitar o limite de tamanho"""
+        removidos = 0
+        with self._indice_travado():
+            candidatos = sorted(
+                (url for url in self.indice if url != manter),
+                key=lambda url: self.indice[url].get('ultimo_acesso', 0)
+            )
+
+            for url in candidatos:
+                if self.tamanho_total() <= self.max_bytes:
+                    break
+                self.remover(url)
+                removidos += 1
+
+        if removidos:
+            logger.info(f"Cache: {removidos} arquivos removidos (limite {self.max_bytes} bytes)")
+        return removidos
+
+    def remover(self, url):
+        """Remove a URL do cache"""
+        with self._indice_travado():
+            entrada = self.indice.pop(url, None)
+            if entrada:
+                caminho = os.path.join(self.diretorio, entrada['arquivo'])
+                if os.path.exists(caminho):
+                    os.remove(caminho)
+
+    def limpar(self):
+        """Remove todos os arquivos do cache"""
+        with self._indice_travado():
+            for url in list(self.indice):
+                self.remover(url)
+        logger.info("Cache limpo")
+
+    def listar(self):
+        """Lista as entradas do cache para inspecao"""
+        linhas = []
+        for url, entrada in sorted(self.indice.items(), key=lambda item: -item[1].get('ultimo_acesso', 0)):
+            linhas.append({
+                'url': url,
+                'arquivo': entrada['arquivo'],
+                'tamanho': entrada.get('tamanho', 0),
+                'etag': entrada.get('etag'),
+                'last_modified': entrada.get('last_modified'),
+                'sha256': entrada.get('sha256'),
+                'ingerido': entrada.get('sha256') == entrada.get('sha256_ingerido'),
+                'ultimo_acesso': time.strftime('%Y-%m-%d %H:%M:%S',
+                                               time.localtime(entrada.get('ultimo_acesso', 0)))
+            })
+        return linhas
+
+    def imprimir_resumo(self):
+        """Imprime o conteudo do cache no terminal"""
+        entradas = self.listar()
+        print(f"\nCACHE DE ARQUIVOS ({self.diretorio})")
+        print("=" * 60)
+        print(f"Arquivos: {len(entradas)} | Total: {self.tamanho_total() / 1e6:.1f} MB "
+              f"| Limite: {self.max_bytes / 1e6:.1f} MB")
+        for entrada in entradas:
+            status = 'ingerido' if entrada['ingerido'] else 'pendente'
+            print(f"\n{entrada['url']}")
+            print(f"  arquivo: {entrada['arquivo']} ({entrada['tamanho'] / 1e6:.1f} MB, {status})")
+            print(f"  etag: {entrada['etag']} | last-modified: {entrada['last_modified']}")
+            print(f"  sha256: {entrada['sha256']}")
+            print(f"  ultimo acesso: {entrada['ultimo_acesso']}")
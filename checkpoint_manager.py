@@ -0,0 +1,51 @@
+# ====================================
+# MODULO: CHECKPOINTS DE INGESTAO INCREMENTAL
+# ====================================
+
+import json
+import logging
+import os
+from config import CACHE_CONFIG
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class CheckpointManager:
+    """Guarda, por arquivo COTAHIST, ate onde ele ja foi processado"""
+
+    def __init__(self, caminho=None):
+        self.caminho = caminho or os.path.join(CACHE_CONFIG['diretorio'], 'checkpoints.json')
+        os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+        self.checkpoints = self._carregar()
+
+    def _carregar(self):
+        """Carrega os checkpoints gravados"""
+        try:
+            with open(self.caminho, 'r', encoding='utf-8') as arquivo:
+                return json.load(arquivo)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Arquivo de checkpoints invalido, ignorando: {e}")
+            return {}
+
+    def obter(self, arquivo):
+        """Retorna o checkpoint do arquivo (offset, data, sha256 do prefixo) ou None"""
+        return self.checkpoints.get(arquivo)
+
+    def salvar(self, arquivo, checkpoint):
+        """Grava o checkpoint do arquivo de forma atomica"""
+        self.checkpoints[arquivo] = checkpoint
+        temporario = self.caminho + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as saida:
+            json.dump(self.checkpoints, saida, indent=2)
+        os.replace(temporario, self.caminho)
+        logger.info(f"Checkpoint de {arquivo}: offset {checkpoint['offset']}, data {checkpoint['data']}")
+
+    def remover(self, arquivo):
+        """Descarta o checkpoint do arquivo (forca o processamento completo)"""
+        if self.checkpoints.pop(arquivo, None) is not None:
+            with open(self.caminho, 'w', encoding='utf-8') as saida:
+                json.dump(self.checkpoints, saida, indent=2)
@@ -0,0 +1,162 @@
+# ====================================
+# MODULO: CLASSIFICACAO DE ATIVOS (TIPO E SETOR)
+# ====================================
+
+import hashlib
+import json
+import logging
+import re
+import numpy as np
+import pandas as pd
+from config import CLASSIFICACAO_CONFIG
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def carregar_regras(caminho=None):
+    """Carrega a tabela de regras de classificacao (JSON editavel)"""
+    caminho = caminho or CLASSIFICACAO_CONFIG['regras']
+    with open(caminho, 'r', encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+def _regex_palavras(palavras):
+    """Compila a lista de palavras em uma unica expressao (qualquer ocorrencia)"""
+    if not palavras:
+        return None
+    return re.compile('|'.join(re.escape(palavra) for palavra in palavras))
+
+
+def _somente_texto(serie):
+    """Valores que nao sao texto viram nulos (na versao por linha geravam excecao)"""
+    serie = serie.astype(object)
+    return serie.where(serie.map(type) == str)
+
+
+class ClassificadorAtivos:
+    """Classifica ativos por tipo e setor aplicando a tabela de regras por coluna
+
+    As regras de tipo sao avaliadas na ordem da tabela; a primeira que casar define
+    o tipo. Dentro de um tipo, vale o primeiro setor cujas palavras aparecem no nome.
+    Condicoes de um tipo (combinadas com OU), na ordem de avaliacao:
+    codigo_termina_com, nome_contem e codigo_comeca_com. Tipo sem condicoes casa tudo.
+    """
+
+    def __init__(self, regras=None):
+        self.regras = regras or carregar_regras()
+        padrao = self.regras.get('padrao', {})
+        self.tipo_padrao = padrao.get('tipo', 'ACAO')
+        self.setor_padrao = padrao.get('setor', 'Outros')
+        self.tipos = [self._compilar_tipo(regra) for regra in self.regras['tipos']]
+        # Carimbo das regras: classificacoes gravadas com outra versao sao refeitas
+        self.versao = hashlib.sha256(
+            json.dumps(self.regras, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        ).hexdigest()[:16]
+
+    def _compilar_tipo(self, regra):
+        """Pre-compila as condicoes e os setores de uma regra de tipo"""
+        return {
+            'tipo': regra['tipo'],
+            'sufixos': tuple(regra.get('codigo_termina_com', [])),
+            'nome': _regex_palavras(regra.get('nome_contem')),
+            'prefixos': tuple(regra.get('codigo_comeca_com', [])),
+            'setor': regra.get('setor'),
+            'setores': [(setor['setor'], _regex_palavras(setor['palavras']))
+                        for setor in regra.get('setores', [])],
+            'setor_padrao': regra.get('setor_padrao', self.setor_padrao)
+        }
+
+    def classificar(self, df):
+        """Retorna DataFrame (mesmo indice) com tipo e setor para as colunas codigo e nome"""
+        codigo = _somente_texto(df['codigo'])
+        # Palavras-chave sao buscadas so nos nomes distintos (opcoes e fracionarios repetem o nome)
+        posicao_nome, nomes = pd.factorize(_somente_texto(df['nome']).str.upper())
+        nomes = pd.Series(nomes, dtype=object)
+        tem_nome = pd.Series(posicao_nome >= 0, index=df.index)
+
+        def nome_contem(regex):
+            mascara = np.append(nomes.str.contains(regex, regex=True, na=False).to_numpy(dtype=bool), False)
+            return pd.Series(mascara[posicao_nome], index=df.index)
+
+        tipo = pd.Series(self.tipo_padrao, index=df.index, dtype=object)
+        setor = pd.Series(self.setor_padrao, index=df.index, dtype=object)
+
+        # Codigo invalido fica com o padrao
+        pendente = codigo.notna()
+
+        for regra in self.tipos:
+            if not pendente.any():
+                break
+
+            casou = pd.Series(False, index=df.index)
+            tem_condicao = False
+
+            if regra['sufixos']:
+                tem_condicao = True
+                casou |= pendente & codigo.str.endswith(regra['sufixos'], na=False)
+
+            if regra['nome'] is not None:
+                tem_condicao = True
+                # Nome nulo avaliado aqui fica com o padrao
+                pendente &= casou | tem_nome
+                casou |= pendente & nome_contem(regra['nome'])
+
+            if regra['prefixos']:
+                tem_condicao = True
+                casou |= pendente & codigo.str.startswith(regra['prefixos'], na=False)
+
+            if not tem_condicao:
+                casou = pendente.copy()
+
+            casou &= pendente
+            pendente &= ~casou
+
+            if regra['setores']:
+                # Setor depende do nome: nome nulo fica com o padrao
+                casou &= tem_nome
+                setores_nomes = np.select(
+                    [nomes.str.contains(regex, regex=True, na=False).to_numpy(dtype=bool) for _, regex in regra['setores']],
+                    [nome_setor for nome_setor, _ in regra['setores']],
+                    default=regra['setor_padrao']
+                ).astype(object)
+                setor[casou] = setores_nomes[posicao_nome[casou.to_numpy()]]
+            else:
+                setor[casou] = regra['setor'] or regra['setor_padrao']
+            tipo[casou] = regra['tipo']
+
+        return pd.DataFrame({'tipo': tipo, 'setor': setor}, index=df.index)
+
+    def classificar_com_cache(self, df, cache=None):
+        """Reaproveita tipo e setor de (codigo, nome) ja classificados com a versao atual das regras
+
+        cache: DataFrame com codigo, nome, tipo, setor e regras_versao (ex.: tabela ativos).
+        Retorna (DataFrame com tipo e setor, mascara das linhas reaproveitadas do cache).
+        """
+        resultado = pd.DataFrame({'tipo': self.tipo_padrao, 'setor': self.setor_padrao},
+                                 index=df.index, dtype=object)
+        reaproveitado = pd.Series(False, index=df.index)
+
+        if cache is not None and not cache.empty and 'regras_versao' in cache.columns:
+            validos = cache[cache['regras_versao'] == self.versao].drop_duplicates(['codigo', 'nome'])
+            if not validos.empty:
+                chaves = pd.MultiIndex.from_frame(validos[['codigo', 'nome']].astype(object))
+                posicao = chaves.get_indexer(pd.MultiIndex.from_frame(df[['codigo', 'nome']].astype(object)))
+                reaproveitado = pd.Series(posicao >= 0, index=df.index)
+                encontrados = posicao[posicao >= 0]
+                resultado.loc[reaproveitado, 'tipo'] = validos['tipo'].to_numpy()[encontrados]
+                resultado.loc[reaproveitado, 'setor'] = validos['setor'].to_numpy()[encontrados]
+
+        novos = ~reaproveitado
+        if novos.any():
+            resultado.loc[novos, ['tipo', 'setor']] = self.classificar(df[novos])
+
+        logger.info(f"Classificacao: {int(reaproveitado.sum())} ativos reaproveitados do cache, "
+                    f"{int(novos.sum())} classificados (regras {self.versao})")
+        return resultado, reaproveitado
+
+    def classificar_um(self, codigo, nome):
+        """Classifica um unico ativo, retornando (tipo, setor)"""
+        resultado = self.classificar(pd.DataFrame({'codigo': [codigo], 'nome': [nome]}, dtype=object))
+        return resultado.at[0, 'tipo'], resultado.at[0, 'setor']
@@ -28,12 +28,58 @@ engine = create_engine(
     }
 )
 
+# Configurações da carga de cotacoes no banco
+CARGA_CONFIG = {
+    'copy_min_linhas': 5000,  # A partir desse tamanho a carga usa COPY + tabela de staging
+    'copy_lote': 200000,  # Linhas serializadas em CSV por comando COPY
+    'executemany_lote': 1000  # Tamanho dos lotes do INSERT em frames pequenos
+}
+
+# Leitura de consultas grandes
+CONSULTA_CONFIG = {
+    'lote_iteracao': 50000  # Linhas por lote no cursor do servidor (iter_query)
+}
+
+# Layout da tabela cotacoes
+PARTICIONAMENTO_CONFIG = {
+    # True: cotacoes particionada por mes (range em data); particoes criadas conforme as datas carregadas
+    'cotacoes_por_mes': False
+}
+
+# Configurações das migracoes versionadas do schema
+MIGRACOES_CONFIG = {
+    'diretorio': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+}
+
+# Configurações do advisor de indices (EXPLAIN das consultas dos relatorios)
+ADVISOR_CONFIG = {
+    'limiar_linhas': 10000,  # Seq Scan com estimativa acima disso e sinalizado
+    'arquivos_sql': [os.path.join(os.path.dirname(os.path.abspath(__file__)), 'consultas_powerbi.sql')]
+}
+
+# Estatisticas do resumo do sistema
+ESTATISTICAS_CONFIG = {
+    'modo': 'exato'  # 'exato' (contadores da ingestao) ou 'estimado' (pg_class.reltuples)
+}
+
 # Configurações da B3
 B3_CONFIG = {
-    'cotahist_url': 'https://bvmf.bmfbovespa.com.br/InstDados/SerHist/COTAHIST_A2024.ZIP',
-    'cotahist_url_2025': 'https://bvmf.bmfbovespa.com.br/InstDados/SerHist/COTAHIST_A2025.ZIP',
+    'cotahist_url_anual': 'https://bvmf.bmfbovespa.com.br/InstDados/SerHist/COTAHIST_A{ano}.ZIP',
+    'cotahist_url_diario': 'https://bvmf.bmfbovespa.com.br/InstDados/SerHist/COTAHIST_D{data:%d%m%Y}.ZIP',
+    'fonte_cotahist': 'anual',  # 'anual' (COTAHIST_Aaaaa) ou 'diario' (COTAHIST_Dddmmaaaa, com fallback para o anual)
     'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
     'timeout': 30,
+    'download_mode': 'stream',  # 'stream' (blocos em arquivo temporario, com retomada) ou 'memoria'
+    'download_chunk': 64 * 1024,  # Tamanho dos blocos lidos no download em stream
+    'download_tentativas': 5,  # Retomadas com HTTP Range apos queda de conexao
+    'spool_max_bytes': 32 * 1024 * 1024,  # Acima disso o arquivo temporario vai para o disco
+    'parser_engine': 'fwf',  # 'fwf' (pandas.read_fwf) ou 'numpy' (registros de largura fixa)
+    'ingestao_incremental': True,  # Processa so a cauda nova do arquivo anual (checkpoint por arquivo)
+    'parse_workers': 1,  # Processos no parse do COTAHIST (1 = serial, 0 = todos os nucleos)
+    # Predicado aplicado nos bytes do COTAHIST antes do parse (ex.: {'tpmerc': ['010'], 'codbdi': ['02', '12']})
+    'filtro_cotahist': {},
+    # Colunas mantidas em centavos (int64) no pipeline; convertidas para reais so na gravacao no banco
+    'colunas_centavos': ['preco_abertura', 'maximo', 'minimo', 'preco_medio', 'preco_fechamento', 'volume_financeiro'],
     'colunas_csv': [
         'TIPREG', 'DATA', 'CODBDI', 'CODNEG', 'TPMERC', 'NOMRES', 'ESPECI',
         'PRAZOT', 'MODREF', 'PREABE', 'PREMAX', 'PREMIN', 'PREMED', 'PREULT',
@@ -42,6 +88,30 @@ B3_CONFIG = {
     ]
 }
 
+# Configurações do cache local de arquivos da B3
+CACHE_CONFIG = {
+    'habilitado': True,
+    'diretorio': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache'),
+    'max_bytes': 2 * 1024 ** 3  # Remove os arquivos menos acessados acima desse total
+}
+
+# Configurações do dataset Parquet dos anos ja processados (requer pyarrow)
+PARQUET_CONFIG = {
+    'habilitado': True,
+    'diretorio': os.path.join(CACHE_CONFIG['diretorio'], 'parquet')
+}
+
+# Configurações da classificacao de ativos (tipo e setor)
+CLASSIFICACAO_CONFIG = {
+    'regras': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'regras_classificacao.json')
+}
+
+# Configurações da carga historica (backfill)
+BACKFILL_CONFIG = {
+    'workers': 4,  # Processos de download/parse, um arquivo anual por processo
+    'manifesto': os.path.join(CACHE_CONFIG['diretorio'], 'backfill_manifesto.json')
+}
+
 # Configurações de Log
 LOG_CONFIG = {
     'format': '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -60,10 +130,11 @@ def calcular_d1():
     
     return data_d1
 
-def get_cotahist_url():
-    """Retorna a URL do COTAHIST baseada no ano atual"""
-    ano_atual = datetime.now().year
-    if ano_atual >= 2025:
-        return B3_CONFIG['cotahist_url_2025']
-    else:
-        return B3_CONFIG['cotahist_url']
+def get_cotahist_url(ano=None):
+    """Retorna a URL do COTAHIST anual (por padrao, do ano atual)"""
+    ano = ano or datetime.now().year
+    return B3_CONFIG['cotahist_url_anual'].format(ano=ano)
+
+def get_cotahist_daily_url(data):
+    """Retorna a URL do COTAHIST diario (COTAHIST_DddMMyyyy) da data informada"""
+    return B3_CONFIG['cotahist_url_diario'].format(data=data)
@@ -38,8 +38,7 @@ SELECT
     ROUND((d.valor / c.preco_fechamento * 100), 2) as yield_percent
 FROM dividendos d
 JOIN ativos a ON d.id_ativo = a.id
-LEFT JOIN cotacoes c ON c.id_ativo = a.id 
-    AND c.data = (SELECT MAX(data) FROM cotacoes WHERE id_ativo = a.id)
+LEFT JOIN cotacoes_ultima c ON c.id_ativo = a.id
 ORDER BY d.data DESC, yield_percent DESC;
 
 -- ====================================
@@ -83,14 +82,7 @@ SELECT
     ((cot.preco_fechamento - c.preco_medio) / c.preco_medio) * 100 as rentabilidade_pct
 FROM carteira c
     JOIN ativos a ON c.id_ativo = a.id
-    LEFT JOIN (
-    SELECT DISTINCT ON (id_ativo) 
-        id_ativo ,
-    preco_fechamento,
-    data
-FROM cotacoes
-    ORDER BY id_ativo, data DESC
-) cot ON c.id_ativo = cot.id_ativo
+    LEFT JOIN cotacoes_ultima cot ON c.id_ativo = cot.id_ativo
 ORDER BY valor_atual DESC;
 
 -- 3. HISTÓRICO DE COTAÇÕES (ÚLTIMOS 30 DIAS)
@@ -139,13 +131,7 @@ SELECT
     SUM(c.qtd * cot.preco_fechamento) as valor_atual_setor
 FROM carteira c
     JOIN ativos a ON c.id_ativo = a.id
-    LEFT JOIN (
-    SELECT DISTINCT ON (id_ativo) 
-        id_ativo ,
-    preco_fechamento
-FROM cotacoes
-    ORDER BY id_ativo, data DESC
-) cot ON c.id_ativo = cot.id_ativo
+    LEFT JOIN cotacoes_ultima cot ON c.id_ativo = cot.id_ativo
 WHERE a.setor IS NOT NULL
 GROUP BY a.setor
 ORDER BY valor_atual_setor DESC;
@@ -160,13 +146,7 @@ SELECT
     ((cot.preco_fechamento - c.preco_medio) / c.preco_medio) * 100 as rentabilidade
 FROM carteira c
     JOIN ativos a ON c.id_ativo = a.id
-    LEFT JOIN (
-    SELECT DISTINCT ON (id_ativo) 
-        id_ativo ,
-    preco_fechamento
-FROM cotacoes
-    ORDER BY id_ativo, data DESC
-) cot ON c.id_ativo = cot.id_ativo
+    LEFT JOIN cotacoes_ultima cot ON c.id_ativo = cot.id_ativo
 ORDER BY valor_posicao DESC
 LIMIT 10;
 
@@ -215,13 +195,7 @@ SELECT
     (SUM(d.valor) / cot.preco_fechamento) * 100 as dividend_yield
 FROM dividendos d
     JOIN ativos a ON d.id_ativo = a.id
-    LEFT JOIN (
-    SELECT DISTINCT ON (id_ativo) 
-        id_ativo ,
-    preco_fechamento
-    FROM cotacoes
-ORDER BY id_ativo, data DESC
-) cot ON d.id_ativo = cot.id_ativo
+    LEFT JOIN cotacoes_ultima cot ON d.id_ativo = cot.id_ativo
 WHERE d.data >= CURRENT_DATE - INTERVAL '12 months'
 GROUP BY a.codigo, a.nome, cot.preco_fechamento
 HAVING SUM
@@ -240,13 +214,7 @@ UNION ALL
         'Valor Atual da Carteira' as metrica,
         'R$ ' || TO_CHAR(SUM(c.qtd * cot.preco_fechamento), 'FM999,999,999.00') as valor
     FROM carteira c
-        LEFT JOIN (
-    SELECT DISTINCT ON (id_ativo) 
-        id_ativo ,
-        preco_fechamento
-FROM cotacoes
-    ORDER BY id_ativo, data DESC
-) cot ON c.id_ativo = cot.id_ativo
+        LEFT JOIN cotacoes_ultima cot ON c.id_ativo = cot.id_ativo
 UNION ALL
 SELECT
     'Rentabilidade Total' as metrica,
@@ -256,13 +224,7 @@ SELECT
         'FM999.00'
     ) || '%' as valor
 FROM carteira c
-    LEFT JOIN (
-    SELECT DISTINCT ON (id_ativo) 
-        id_ativo ,
-    preco_fechamento
-FROM cotacoes
-    ORDER BY id_ativo, data DESC
-) cot ON c.id_ativo = cot.id_ativo
+    LEFT JOIN cotacoes_ultima cot ON c.id_ativo = cot.id_ativo
 UNION ALL
 SELECT
     'Total de Ativos' as metrica,
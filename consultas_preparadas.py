@@ -0,0 +1,127 @@
+# ====================================
+# MODULO: CONSULTAS PREPARADAS DOS RELATORIOS
+# ====================================
+
+import logging
+import re
+import time
+from bisect import bisect_left
+import pandas as pd
+from config import engine
+from consultas_relatorios import CONSULTAS
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Limites superiores (ms) das faixas do histograma de latencia; a ultima faixa e aberta
+LIMITES_LATENCIA_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000]
+
+# Metricas do processo por consulta (compartilhadas entre relatorios, graficos e interface;
+# inclui as consultas grandes executadas pelo caminho tipado do DatabaseManager)
+_metricas = {}
+
+
+def sql_posicional(sql):
+    """Troca os marcadores %s por $1, $2, ... (sintaxe do PREPARE)"""
+    posicoes = iter(range(1, sql.count('%s') + 1))
+    return re.sub(r'%s', lambda _: f"${next(posicoes)}", sql)
+
+
+def registrar(nome, duracao):
+    """Soma uma execucao (duracao em segundos) as metricas da consulta"""
+    metrica = _metricas.setdefault(nome, {
+        'chamadas': 0,
+        'total_ms': 0.0,
+        'histograma': [0] * (len(LIMITES_LATENCIA_MS) + 1)
+    })
+    duracao_ms = duracao * 1000
+    metrica['chamadas'] += 1
+    metrica['total_ms'] += duracao_ms
+    metrica['histograma'][bisect_left(LIMITES_LATENCIA_MS, duracao_ms)] += 1
+
+
+def percentil(histograma, fracao):
+    """Limite superior (ms) da faixa que contem o percentil (None se cair na faixa aberta)"""
+    alvo = fracao * sum(histograma)
+    acumulado = 0
+    for faixa, quantidade in enumerate(histograma):
+        acumulado += quantidade
+        if acumulado >= alvo:
+            return LIMITES_LATENCIA_MS[faixa] if faixa < len(LIMITES_LATENCIA_MS) else None
+    return None
+
+
+def metricas():
+    """Chamadas, tempo total/medio, p50/p95 e histograma de latencia por consulta (mais custosa primeiro)"""
+    faixas = [f"<={limite}ms" for limite in LIMITES_LATENCIA_MS] + [f">{LIMITES_LATENCIA_MS[-1]}ms"]
+    linhas = []
+    for nome, metrica in _metricas.items():
+        linhas.append({
+            'consulta': nome,
+            'chamadas': metrica['chamadas'],
+            'total_ms': round(metrica['total_ms'], 1),
+            'media_ms': round(metrica['total_ms'] / metrica['chamadas'], 2),
+            'p50_ms': percentil(metrica['histograma'], 0.5),
+            'p95_ms': percentil(metrica['histograma'], 0.95),
+            **dict(zip(faixas, metrica['histograma']))
+        })
+    if not linhas:
+        return pd.DataFrame(columns=['consulta', 'chamadas', 'total_ms', 'media_ms', 'p50_ms', 'p95_ms'] + faixas)
+    return pd.DataFrame(linhas).sort_values('total_ms', ascending=False).reset_index(drop=True)
+
+
+class ConsultasPreparadas:
+    """Executa por nome as consultas do registro, preparadas uma vez por conexao do pool"""
+
+    def __init__(self):
+        self.engine = engine
+
+    def executar(self, nome, params=None):
+        """Linhas e colunas da consulta registrada; faz o PREPARE na conexao se ainda nao feito"""
+        if nome not in CONSULTAS:
+            raise ValueError(f"Consulta nao registrada: {nome}")
+        params = tuple(params) if params else ()
+        esperados = CONSULTAS[nome]['sql'].count('%s')
+        if len(params) != esperados:
+            raise ValueError(f"Consulta {nome} espera {esperados} parametros e recebeu {len(params)}")
+
+        preparada = f"rel_{nome}"
+        conexao = self.engine.raw_connection()
+        try:
+            cursor = conexao.cursor()
+            # info vive com a conexao DBAPI do pool (zerado ao reciclar/invalidar): um PREPARE por conexao
+            preparadas = conexao.info.setdefault('consultas_preparadas', set())
+            if nome not in preparadas:
+                cursor.execute(f"PREPARE {preparada} AS {sql_posicional(CONSULTAS[nome]['sql'])}")
+                preparadas.add(nome)
+
+            inicio = time.perf_counter()
+            if params:
+                cursor.execute(f"EXECUTE {preparada} ({', '.join(['%s'] * len(params))})", params)
+            else:
+                cursor.execute(f"EXECUTE {preparada}")
+            linhas = cursor.fetchall()
+            registrar(nome, time.perf_counter() - inicio)
+
+            colunas = [descricao[0] for descricao in cursor.description]
+            cursor.close()
+            # PREPARE nao e transacional: o rollback so encerra a transacao de leitura
+            conexao.rollback()
+        except Exception:
+            conexao.rollback()
+            raise
+        finally:
+            conexao.close()
+        return linhas, colunas
+
+    def imprimir_metricas(self):
+        """Imprime as metricas das consultas dos relatorios deste processo (preparadas e tipadas)"""
+        df = metricas()
+        print("\nCONSULTAS DOS RELATORIOS (chamadas e latencia neste processo)")
+        print("=" * 60)
+        if df.empty:
+            print("Nenhuma consulta executada")
+            return df
+        print(df[['consulta', 'chamadas', 'total_ms', 'media_ms', 'p50_ms', 'p95_ms']].to_string(index=False))
+        return df
@@ -0,0 +1,142 @@
+# ====================================
+# MODULO: CONSULTAS DOS RELATORIOS
+# ====================================
+
+from datetime import date, timedelta
+
+# Consultas fixas dos relatorios e graficos, por nome (uma variante por combinacao de filtros:
+# o texto nunca e montado por concatenacao e cada variante tem seu proprio plano).
+# Consultas pequenas e frequentes sao preparadas por conexao (execute_prepared);
+# as de resultado grande (historico, dividendos) vao pelo caminho tipado com COPY (execute_tipado).
+# 'exemplo' gera parametros representativos (usados pelo advisor de indices no EXPLAIN).
+CONSULTAS = {
+    'historico_cotacoes': {
+        'sql': """
+            SELECT c.data, c.preco_abertura, c.preco_fechamento,
+                   c.maximo, c.minimo, c.volume_financeiro, a.nome
+            FROM cotacoes c
+            JOIN ativos a ON c.id_ativo = a.id
+            WHERE a.codigo = %s
+            AND c.data >= %s
+            ORDER BY c.data
+        """,
+        'exemplo': lambda: ('PETR4', date.today() - timedelta(days=30))
+    },
+    'dividendos_todos': {
+        'sql': """
+            SELECT a.codigo, a.nome, d.data, d.valor, d.tipo,
+                   EXTRACT(YEAR FROM d.data) as ano,
+                   EXTRACT(MONTH FROM d.data) as mes
+            FROM dividendos d
+            JOIN ativos a ON d.id_ativo = a.id
+            ORDER BY d.data DESC
+        """,
+        'exemplo': lambda: None
+    },
+    'dividendos_ativo': {
+        'sql': """
+            SELECT a.codigo, a.nome, d.data, d.valor, d.tipo,
+                   EXTRACT(YEAR FROM d.data) as ano,
+                   EXTRACT(MONTH FROM d.data) as mes
+            FROM dividendos d
+            JOIN ativos a ON d.id_ativo = a.id
+            WHERE a.codigo = %s
+            ORDER BY d.data DESC
+        """,
+        'exemplo': lambda: ('PETR4',)
+    },
+    'dividendos_ano': {
+        'sql': """
+            SELECT a.codigo, a.nome, d.data, d.valor, d.tipo,
+                   EXTRACT(YEAR FROM d.data) as ano,
+                   EXTRACT(MONTH FROM d.data) as mes
+            FROM dividendos d
+            JOIN ativos a ON d.id_ativo = a.id
+            WHERE d.data >= %s AND d.data < %s
+            ORDER BY d.data DESC
+        """,
+        'exemplo': lambda: (date(date.today().year, 1, 1), date(date.today().year + 1, 1, 1))
+    },
+    'dividendos_ativo_ano': {
+        'sql': """
+            SELECT a.codigo, a.nome, d.data, d.valor, d.tipo,
+                   EXTRACT(YEAR FROM d.data) as ano,
+                   EXTRACT(MONTH FROM d.data) as mes
+            FROM dividendos d
+            JOIN ativos a ON d.id_ativo = a.id
+            WHERE a.codigo = %s
+            AND d.data >= %s AND d.data < %s
+            ORDER BY d.data DESC
+        """,
+        'exemplo': lambda: ('PETR4', date(date.today().year, 1, 1), date(date.today().year + 1, 1, 1))
+    },
+    'ativos_todos': {
+        'sql': "SELECT codigo, nome, tipo, setor FROM ativos ORDER BY codigo",
+        'exemplo': lambda: None
+    },
+    'ativos_tipo': {
+        'sql': "SELECT codigo, nome, tipo, setor FROM ativos WHERE tipo = %s ORDER BY codigo",
+        'exemplo': lambda: ('ACAO',)
+    },
+    'ativos_setor': {
+        'sql': "SELECT codigo, nome, tipo, setor FROM ativos WHERE setor = %s ORDER BY codigo",
+        'exemplo': lambda: ('Bancos',)
+    },
+    'ativos_tipo_setor': {
+        'sql': "SELECT codigo, nome, tipo, setor FROM ativos WHERE tipo = %s AND setor = %s ORDER BY codigo",
+        'exemplo': lambda: ('ACAO', 'Bancos')
+    },
+    'setores': {
+        'sql': "SELECT DISTINCT setor FROM ativos WHERE setor IS NOT NULL AND setor != '' ORDER BY setor",
+        'exemplo': lambda: None
+    },
+    'setores_tipo': {
+        'sql': "SELECT DISTINCT setor FROM ativos WHERE tipo = %s AND setor IS NOT NULL AND setor != '' ORDER BY setor",
+        'exemplo': lambda: ('ACAO',)
+    },
+    'carteira_alocacao': {
+        'sql': """
+            SELECT
+                a.codigo, a.nome, a.tipo, a.setor,
+                c.qtd, c.preco_medio,
+                c.qtd * c.preco_medio as valor_investido,
+                cot.preco_fechamento as preco_atual,
+                c.qtd * cot.preco_fechamento as valor_atual,
+                (c.qtd * cot.preco_fechamento) - (c.qtd * c.preco_medio) as ganho_perda,
+                ((cot.preco_fechamento - c.preco_medio) / c.preco_medio) * 100 as rentabilidade_pct
+            FROM carteira c
+            JOIN ativos a ON c.id_ativo = a.id
+            LEFT JOIN cotacoes_ultima cot ON c.id_ativo = cot.id_ativo
+        """,
+        'exemplo': lambda: None
+    },
+    'exportar_cotacoes': {
+        'sql': """
+            SELECT a.codigo, c.data, c.preco_abertura, c.maximo, c.minimo,
+                   c.preco_fechamento, c.negocios, c.volume_financeiro
+            FROM cotacoes c
+            JOIN ativos a ON c.id_ativo = a.id
+            WHERE c.data >= %s AND c.data <= %s
+            ORDER BY c.data, a.codigo
+        """,
+        'exemplo': lambda: (date(date.today().year, 1, 1), date.today())
+    }
+}
+
+
+def sql(nome):
+    """Texto da consulta registrada"""
+    return CONSULTAS[nome]['sql']
+
+
+def consulta_dividendos(codigo_ativo=None, ano=None):
+    """(nome, parametros) da variante de dividendos para os filtros informados"""
+    # Ano como intervalo na coluna (sem EXTRACT) para usar indice/particoes de data
+    periodo = (date(int(ano), 1, 1), date(int(ano) + 1, 1, 1)) if ano else ()
+    if codigo_ativo and ano:
+        return 'dividendos_ativo_ano', (codigo_ativo,) + periodo
+    if codigo_ativo:
+        return 'dividendos_ativo', (codigo_ativo,)
+    if ano:
+        return 'dividendos_ano', periodo
+    return 'dividendos_todos', ()
@@ -0,0 +1,293 @@
+# ====================================
+# MODULO: PARSER DO LAYOUT COTAHIST
+# ====================================
+
+import numpy as np
+import pandas as pd
+import logging
+from datetime import datetime
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Layout do registro COTAHIST da B3: (coluna, inicio, fim) com posicoes 0-based
+COTAHIST_LAYOUT = [
+    ('TIPREG', 0, 2),
+    ('DATA', 2, 10),
+    ('CODBDI', 10, 12),
+    ('CODNEG', 12, 24),
+    ('TPMERC', 24, 27),
+    ('NOMRES', 27, 39),
+    ('ESPECI', 39, 49),
+    ('PRAZOT', 49, 52),
+    ('MODREF', 52, 56),
+    ('PREABE', 56, 69),
+    ('PREMAX', 69, 82),
+    ('PREMIN', 82, 95),
+    ('PREMED', 95, 108),
+    ('PREULT', 108, 121),
+    ('PREOFC', 121, 134),
+    ('PREOFV', 134, 147),
+    ('TOTNEG', 147, 152),
+    ('QUATOTNEG', 152, 170),
+    ('VOLTOT', 170, 188),
+    ('PREEXE', 188, 201),
+    ('INDOPC', 201, 202),
+    ('DATVEN', 202, 210),
+    ('FATCOT', 210, 217),
+    ('PTOEXE', 217, 230),
+    ('CODISI', 230, 242),
+    ('DISMES', 242, 245),
+]
+
+TAMANHO_REGISTRO = 245
+
+COTAHIST_COLSPECS = [(inicio, fim) for _, inicio, fim in COTAHIST_LAYOUT]
+POSICOES = {nome: (inicio, fim) for nome, inicio, fim in COTAHIST_LAYOUT}
+
+# Colunas decodificadas pelo engine numpy (as demais nao sao usadas no pipeline)
+COLUNAS_TEXTO = ['TIPREG', 'CODBDI', 'CODNEG', 'TPMERC', 'NOMRES', 'ESPECI']
+COLUNAS_INTEIRAS = ['PREABE', 'PREMAX', 'PREMIN', 'PREMED', 'PREULT',
+                    'TOTNEG', 'QUATOTNEG', 'VOLTOT']
+# Colunas lidas pelos dois engines, na ordem do layout
+COLUNAS_PIPELINE = [nome for nome, _, _ in COTAHIST_LAYOUT
+                    if nome in COLUNAS_TEXTO + ['DATA'] + COLUNAS_INTEIRAS]
+
+
+def detectar_tamanho_linha(dados):
+    """Retorna o tamanho de cada linha (registro + quebra de linha)"""
+    fim_linha = dados.find(b'\n', 0, TAMANHO_REGISTRO + 2)
+    if fim_linha == -1:
+        return TAMANHO_REGISTRO
+    return fim_linha + 1
+
+
+def criar_dtype_registro(tamanho_linha):
+    """Cria o dtype estruturado de um registro COTAHIST com a quebra de linha"""
+    nomes = [nome for nome, _, _ in COTAHIST_LAYOUT]
+    formatos = [f'S{fim - inicio}' for _, inicio, fim in COTAHIST_LAYOUT]
+    offsets = [inicio for _, inicio, _ in COTAHIST_LAYOUT]
+
+    if tamanho_linha > TAMANHO_REGISTRO:
+        nomes.append('QUEBRA')
+        formatos.append(f'S{tamanho_linha - TAMANHO_REGISTRO}')
+        offsets.append(TAMANHO_REGISTRO)
+
+    return np.dtype({
+        'names': nomes,
+        'formats': formatos,
+        'offsets': offsets,
+        'itemsize': tamanho_linha
+    })
+
+
+def visao_registros(dados):
+    """Retorna os registros do arquivo como array estruturado sem copiar os bytes"""
+    tamanho_linha = detectar_tamanho_linha(dados)
+    dtype = criar_dtype_registro(tamanho_linha)
+    total = len(dados) // tamanho_linha
+
+    registros = np.frombuffer(dados, dtype=dtype, count=total)
+
+    # Ultima linha sem quebra de linha: completar apenas esse registro
+    sobra = len(dados) - total * tamanho_linha
+    if sobra >= TAMANHO_REGISTRO:
+        ultimo = bytes(dados[total * tamanho_linha:]).ljust(tamanho_linha, b'\n')
+        registros = np.concatenate([registros, np.frombuffer(ultimo, dtype=dtype)])
+
+    return registros
+
+
+def bytes_registros(registros):
+    """Visao uint8 (linhas x bytes) de um array estruturado contiguo"""
+    return registros.view(np.uint8).reshape(len(registros), registros.dtype.itemsize)
+
+
+def decodificar_inteiros(matriz, inicio, fim):
+    """Converte um campo numerico de largura fixa em Int64 anulavel (vazios/invalidos viram NA, como no read_fwf)"""
+    valores = np.zeros(len(matriz), dtype=np.int64)
+    validos = np.ones(len(matriz), dtype=bool)
+    tem_digito = np.zeros(len(matriz), dtype=bool)
+    espaco_apos_digito = np.zeros(len(matriz), dtype=bool)
+
+    for posicao in range(inicio, fim):
+        caractere = matriz[:, posicao]
+        eh_digito = (caractere >= 48) & (caractere <= 57)
+        eh_espaco = caractere == 32
+        # Espacos so nas bordas (o read_fwf os remove); espaco entre digitos invalida o campo
+        validos &= (eh_digito | eh_espaco) & ~(eh_digito & espaco_apos_digito)
+        espaco_apos_digito |= eh_espaco & tem_digito
+        tem_digito |= eh_digito
+        valores = np.where(eh_digito, valores * 10 + (caractere.astype(np.int64) - 48), valores)
+
+    validos &= tem_digito
+    valores[~validos] = 0
+    return pd.arrays.IntegerArray(valores, ~validos)
+
+
+def decodificar_datas(matriz, inicio, fim):
+    """Converte um campo AAAAMMDD em datetime64 (invalidos viram NaT)"""
+    aaaammdd = np.zeros(len(matriz), dtype=np.int64)
+    validos = np.ones(len(matriz), dtype=bool)
+
+    for posicao in range(inicio, fim):
+        digito = matriz[:, posicao].astype(np.int64) - 48
+        validos &= (digito >= 0) & (digito <= 9)
+        aaaammdd = aaaammdd * 10 + digito
+
+    ano = aaaammdd // 10000
+    mes = (aaaammdd // 100) % 100
+    dia = aaaammdd % 100
+    validos &= (ano >= 1900) & (mes >= 1) & (mes <= 12) & (dia >= 1) & (dia <= 31)
+
+    ano = np.where(validos, ano, 1970)
+    mes = np.where(validos, mes, 1)
+    dia = np.where(validos, dia, 1)
+
+    inicio_mes = (ano - 1970).astype('datetime64[Y]') + (mes - 1).astype('timedelta64[M]')
+    datas = inicio_mes + (dia - 1).astype('timedelta64[D]')
+
+    # Datas como 20240231 transbordam para o mes seguinte e sao invalidas
+    validos &= datas.astype('datetime64[M]') == inicio_mes
+
+    datas = datas.astype('datetime64[ns]')
+    datas[~validos] = np.datetime64('NaT')
+    return datas
+
+
+def decodificar_texto(registros, coluna):
+    """Decodifica um campo texto (latin1) removendo espacos, como categoria; vazio vira NaN"""
+    # Decodificar apenas os valores distintos (poucos milhares de tickers/nomes)
+    unicos, posicoes = np.unique(registros[coluna], return_inverse=True)
+    textos = np.array([valor.decode('latin1').strip() or np.nan for valor in unicos], dtype=object)
+    codigos, categorias = pd.factorize(textos, sort=True)
+    return pd.Series(pd.Categorical.from_codes(codigos[posicoes.reshape(-1)], categorias))
+
+
+class FiltroCotahist:
+    """Predicado aplicado nos bytes brutos dos registros, antes de qualquer parse"""
+
+    def __init__(self, data_inicio=None, data_fim=None, tpmerc=None, codbdi=None,
+                 tickers=None, tipreg='01'):
+        self.data_inicio = data_inicio
+        self.data_fim = data_fim if data_fim is not None else data_inicio
+        self.tpmerc = tpmerc
+        self.codbdi = codbdi
+        self.tickers = tickers
+        self.tipreg = tipreg
+
+    @property
+    def tem_datas(self):
+        """Indica se o filtro restringe as datas dos registros"""
+        return self.data_inicio is not None
+
+    def com_datas(self, data_inicio, data_fim=None):
+        """Retorna uma copia do filtro restrita ao intervalo de datas"""
+        return FiltroCotahist(
+            data_inicio=data_inicio,
+            data_fim=data_fim,
+            tpmerc=self.tpmerc,
+            codbdi=self.codbdi,
+            tickers=self.tickers,
+            tipreg=self.tipreg
+        )
+
+    def mascara(self, registros):
+        """Retorna a mascara booleana dos registros que atendem ao filtro"""
+        mascara = np.ones(len(registros), dtype=bool)
+
+        if self.tipreg:
+            mascara &= registros['TIPREG'] == self.tipreg.encode('latin1')
+
+        # AAAAMMDD em bytes tem a mesma ordem das datas
+        if self.data_inicio is not None:
+            mascara &= registros['DATA'] >= self.data_inicio.strftime('%Y%m%d').encode('latin1')
+        if self.data_fim is not None:
+            mascara &= registros['DATA'] <= self.data_fim.strftime('%Y%m%d').encode('latin1')
+
+        if self.tpmerc:
+            valores = [str(valor).zfill(3).encode('latin1') for valor in self.tpmerc]
+            mascara &= np.isin(registros['TPMERC'], valores)
+        if self.codbdi:
+            valores = [str(valor).zfill(2).encode('latin1') for valor in self.codbdi]
+            mascara &= np.isin(registros['CODBDI'], valores)
+        if self.tickers:
+            valores = [str(valor).upper().ljust(12).encode('latin1') for valor in self.tickers]
+            mascara &= np.isin(registros['CODNEG'], valores)
+
+        return mascara
+
+    def aplicar(self, dados):
+        """Retorna os registros que atendem ao filtro e suas posicoes no arquivo"""
+        registros = visao_registros(dados)
+        mascara = self.mascara(registros)
+        return registros[mascara], np.flatnonzero(mascara)
+
+    def __repr__(self):
+        return (f"FiltroCotahist(data_inicio={self.data_inicio}, data_fim={self.data_fim}, "
+                f"tpmerc={self.tpmerc}, codbdi={self.codbdi}, tickers={self.tickers})")
+
+
+def resolver_data_alvo(dados, data_d1, filtro=None):
+    """Retorna D-1 se existir no arquivo, senao a data mais recente (ou None)"""
+    registros = visao_registros(dados)
+    if filtro is None:
+        filtro = FiltroCotahist()
+    datas_brutas = np.unique(registros['DATA'][filtro.mascara(registros)])
+
+    datas = set()
+    for valor in datas_brutas:
+        try:
+            datas.add(datetime.strptime(valor.decode('latin1'), '%Y%m%d').date())
+        except ValueError:
+            continue
+
+    if not datas:
+        return None
+    return data_d1 if data_d1 in datas else max(datas)
+
+
+def ultimo_registro_cotacao(dados):
+    """Retorna (fim em bytes, data AAAAMMDD) do ultimo registro 01, ou None"""
+    registros = visao_registros(dados)
+    indices = np.flatnonzero(registros['TIPREG'] == b'01')
+    if len(indices) == 0:
+        return None
+
+    ultimo = indices[-1]
+    fim = min((ultimo + 1) * registros.dtype.itemsize, len(dados))
+    return int(fim), registros['DATA'][ultimo].decode('latin1')
+
+
+def dividir_em_shards(tamanho_arquivo, tamanho_linha, quantidade):
+    """Divide o arquivo em faixas de bytes alinhadas ao inicio dos registros"""
+    total_registros = -(-tamanho_arquivo // tamanho_linha)
+    por_shard = max(1, -(-total_registros // max(1, quantidade)))
+
+    shards = []
+    for primeiro in range(0, total_registros, por_shard):
+        inicio = primeiro * tamanho_linha
+        fim = min((primeiro + por_shard) * tamanho_linha, tamanho_arquivo)
+        shards.append((inicio, fim))
+    return shards
+
+
+def registros_para_dataframe(registros):
+    """Decodifica apenas as colunas usadas pelo pipeline em arrays tipados"""
+    registros = np.ascontiguousarray(registros)
+    matriz = bytes_registros(registros)
+
+    colunas = {}
+    for coluna in COLUNAS_TEXTO:
+        colunas[coluna] = decodificar_texto(registros, coluna)
+
+    colunas['DATA'] = decodificar_datas(matriz, *POSICOES['DATA'])
+
+    for coluna in COLUNAS_INTEIRAS:
+        colunas[coluna] = decodificar_inteiros(matriz, *POSICOES[coluna])
+
+    df = pd.DataFrame({coluna: colunas[coluna] for coluna in COLUNAS_PIPELINE})
+
+    logger.info(f"Registros decodificados pelo engine numpy: {len(df)}")
+    return df
@@ -2,29 +2,181 @@
 # MODULO: COLETA DE DADOS DA B3
 # ====================================
 
+import numpy as np
 import pandas as pd
 import requests
+from pandas.api.types import union_categoricals
 from io import BytesIO
-from zipfile import ZipFile
+from zipfile import ZipFile, BadZipFile
+import hashlib
 import logging
-from datetime import datetime
-from config import B3_CONFIG, calcular_d1, get_cotahist_url
+import mmap
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from config import B3_CONFIG, CACHE_CONFIG, PARQUET_CONFIG, calcular_d1, get_cotahist_url, get_cotahist_daily_url
+from cache_manager import CacheManager
+from checkpoint_manager import CheckpointManager
+from parquet_cache import ParquetCache, parquet_disponivel
+from classificador_ativos import ClassificadorAtivos
+from mapa_ativos import MapaAtivos
+from cotahist_parser import (
+    COTAHIST_COLSPECS, COLUNAS_PIPELINE, COLUNAS_TEXTO, FiltroCotahist, registros_para_dataframe,
+    detectar_tamanho_linha, resolver_data_alvo, dividir_em_shards,
+    ultimo_registro_cotacao
+)
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def extrair_para_arquivo_temporario(zip_file):
+    """Extrai o primeiro arquivo do ZIP para um arquivo temporario em disco"""
+    with zip_file.open(zip_file.namelist()[0]) as origem:
+        with tempfile.NamedTemporaryFile(suffix='.TXT', delete=False) as destino:
+            shutil.copyfileobj(origem, destino, 1024 * 1024)
+            return destino.name
+
+
+def validador_if_range(response):
+    """Validador para o If-Range da retomada: ETag forte ou, sem ela, Last-Modified"""
+    etag = response.headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return response.headers.get('Last-Modified')
+
+
+def tamanho_esperado(response, inicio=0):
+    """Tamanho total do arquivo informado pelo servidor (Content-Range ou Content-Length)"""
+    content_range = response.headers.get('Content-Range', '')
+    if '/' in content_range:
+        total = content_range.rsplit('/', 1)[1].strip()
+        if total.isdigit():
+            return int(total)
+    
+    content_length = response.headers.get('Content-Length', '')
+    if content_length.isdigit():
+        return int(content_length) + (inicio if response.status_code == 206 else 0)
+    
+    return None
+
+
+def texto_categorico(serie):
+    """Texto sem espacos nas bordas como categoria (nulo vira 'nan', como no astype(str))"""
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.astype('category')
+    # Limpar so as categorias distintas; o codigo -1 (nulo) aponta para 'nan'
+    rotulos = serie.cat.categories.astype(str).str.strip().to_numpy(dtype=object)
+    if (serie.cat.codes == -1).any():
+        rotulos = np.append(rotulos, 'nan')
+    codigos, categorias = pd.factorize(rotulos, sort=True)
+    return pd.Series(pd.Categorical.from_codes(codigos[serie.cat.codes.to_numpy()], categorias),
+                     index=serie.index)
+
+
+def inteiro_compacto(serie, dtype='int64'):
+    """Converte para inteiro; com valores invalidos usa o tipo inteiro anulavel"""
+    valores = pd.to_numeric(serie, errors='coerce')
+    if dtype == 'int32' and valores.notna().any():
+        limites = np.iinfo(np.int32)
+        if valores.min() < limites.min or valores.max() > limites.max:
+            logger.warning(f"Valores de {serie.name} excedem int32. Mantendo int64")
+            dtype = 'int64'
+    if valores.isna().any():
+        return valores.astype(dtype.capitalize())
+    return valores.astype(dtype)
+
+
+def concatenar_partes(partes):
+    """Concatena DataFrames mantendo as colunas categoricas (categorias unificadas)"""
+    categoricas = [coluna for coluna in partes[0].columns
+                   if isinstance(partes[0][coluna].dtype, pd.CategoricalDtype)]
+    for coluna in categoricas:
+        categorias = union_categoricals([parte[coluna] for parte in partes], sort_categories=True).categories
+        for parte in partes:
+            parte[coluna] = parte[coluna].cat.set_categories(categorias)
+    return pd.concat(partes)
+
+
+def _processar_shard(tarefa):
+    """Processa um shard do COTAHIST: parse filtrado e transformacao"""
+    caminho, inicio, fim, tamanho_linha, filtro, parser_engine = tarefa
+    
+    with open(caminho, 'rb') as arquivo:
+        arquivo.seek(inicio)
+        dados = arquivo.read(fim - inicio)
+    
+    collector = B3DataCollector(parser_engine=parser_engine, parse_workers=1, filtro=filtro)
+    
+    df_raw = collector.parse_bytes(dados)
+    if df_raw.empty:
+        return pd.DataFrame()
+    
+    # Manter o indice igual ao do parse serial (numero da linha no arquivo)
+    df_raw.index = df_raw.index + inicio // tamanho_linha
+    
+    df_filtered = collector.filter_d1_data(df_raw)
+    if df_filtered.empty:
+        return pd.DataFrame()
+    
+    return collector.transform_data(df_filtered)
+
+
 class B3DataCollector:
     """Coletor de dados da B3"""
     
-    def __init__(self):
+    def __init__(self, parser_engine=None, parse_workers=None, filtro=None):
         self.config = B3_CONFIG
         self.data_d1 = calcular_d1()
+        # Predicado aplicado nos bytes brutos; sem datas, usa D-1 (ou a mais recente)
+        self.filtro = filtro or FiltroCotahist(**self.config.get('filtro_cotahist', {}))
+        # Engine de leitura do COTAHIST: 'fwf' (pandas.read_fwf) ou 'numpy'
+        self.parser_engine = parser_engine or self.config.get('parser_engine', 'fwf')
+        # Processos usados no parse (1 = serial, 0 = todos os nucleos)
+        if parse_workers is None:
+            parse_workers = self.config.get('parse_workers', 1)
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        # Cache local dos arquivos baixados (GET condicional e deteccao de arquivo ja ingerido)
+        self.cache = CacheManager() if CACHE_CONFIG.get('habilitado') else None
+        self.url_arquivo = None
+        self.sha256_arquivo = None
+        self.arquivo_inalterado = False
+        # Checkpoints por arquivo anual: so a cauda nova e processada
+        self.checkpoints = CheckpointManager() if self.config.get('ingestao_incremental') else None
+        self.checkpoint_pendente = None
+        self.fonte_arquivo = 'anual'
+        # Anos ja processados em Parquet, reutilizados enquanto o arquivo de origem nao mudar
+        self.parquet = None
+        if PARQUET_CONFIG.get('habilitado'):
+            if parquet_disponivel():
+                self.parquet = ParquetCache()
+            else:
+                logger.warning("pyarrow nao instalado. Dataset Parquet desabilitado")
+        # Regras de tipo/setor compiladas uma vez por coletor
+        self.classificador = ClassificadorAtivos()
+        # Classificacoes ja gravadas (codigo, nome, tipo, setor, regras_versao), semeadas da tabela ativos
+        self.classificacoes = None
+        # Recuperacao de dias perdidos: intervalo desde a ultima data no banco ate D-1
+        self.recuperacao = False
     
-    def download_cotahist(self):
-        """Download do arquivo COTAHIST da B3"""
+    def download_cotahist(self, url=None, pular_ingerido=True):
+        """Download do arquivo COTAHIST da B3 (pular_ingerido=False forca o processamento de arquivo ja carregado)"""
+        url = url or get_cotahist_url(self.data_d1.year)
+        self.url_arquivo = url
+        self.sha256_arquivo = None
+        self.arquivo_inalterado = False
+        self.checkpoint_pendente = None
+        
+        if self.cache is not None:
+            return self._download_cached(url, pular_ingerido)
+        
+        if self.config.get('download_mode', 'stream') == 'stream':
+            return self._download_streamed(url)
+        
         try:
-            url = get_cotahist_url()
             logger.info(f"Iniciando download do COTAHIST de {url}")
             
             headers = {"User-Agent": self.config['user_agent']}
@@ -57,8 +209,276 @@ class B3DataCollector:
             logger.error(f"Erro no download: {e}")
             return None
     
+    def _download_streamed(self, url):
+        """Download em blocos para arquivo temporario, retomando com HTTP Range"""
+        arquivo = tempfile.SpooledTemporaryFile(max_size=self.config.get('spool_max_bytes', 32 * 1024 * 1024))
+        
+        try:
+            logger.info(f"Iniciando download do COTAHIST de {url}")
+            self._baixar_em_blocos(url, arquivo)
+            
+            # O ZIP e lido direto do arquivo temporario (em disco acima do limite do spool)
+            arquivo.seek(0)
+            zip_file = ZipFile(arquivo)
+            logger.info(f"Arquivo ZIP contem: {zip_file.namelist()}")
+            
+            return zip_file
+            
+        except requests.exceptions.Timeout:
+            logger.error("Timeout no download do arquivo")
+            arquivo.close()
+            return None
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Erro na requisição HTTP: {e}")
+            arquivo.close()
+            return None
+        except Exception as e:
+            logger.error(f"Erro no download: {e}")
+            arquivo.close()
+            return None
+    
+    def _download_cached(self, url, pular_ingerido=True):
+        """Download condicional (ETag/Last-Modified) usando o cache local"""
+        caminho_parcial = self.cache.caminho_temporario(url)
+        
+        try:
+            logger.info(f"Iniciando download do COTAHIST de {url}")
+            
+            with open(caminho_parcial, 'w+b') as arquivo:
+                status, headers = self._baixar_em_blocos(
+                    url, arquivo, self.cache.headers_condicionais(url)
+                )
+            
+            if status == 304:
+                logger.info("Arquivo não modificado desde o último download (HTTP 304)")
+                os.remove(caminho_parcial)
+                self.cache.tocar(url)
+                caminho = self.cache.caminho(url)
+            else:
+                caminho = self.cache.registrar(
+                    url, caminho_parcial, headers.get('ETag'), headers.get('Last-Modified')
+                )
+            
+            self.sha256_arquivo = self.cache.entrada(url)['sha256']
+            
+            if pular_ingerido and self.cache.ja_ingerido(url):
+                logger.info("Arquivo idêntico ao último ingerido. Nada a processar")
+                self.arquivo_inalterado = True
+                return None
+            
+            try:
+                zip_file = ZipFile(caminho)
+            except BadZipFile:
+                # Ex.: pagina de erro no lugar do arquivo; nao manter no cache
+                self.cache.remover(url)
+                raise
+            logger.info(f"Arquivo ZIP contem: {zip_file.namelist()}")
+            
+            return zip_file
+            
+        except requests.exceptions.Timeout:
+            logger.error("Timeout no download do arquivo")
+            return None
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Erro na requisição HTTP: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Erro no download: {e}")
+            return None
+        finally:
+            if os.path.exists(caminho_parcial):
+                os.remove(caminho_parcial)
+    
+    def _baixar_em_blocos(self, url, arquivo, headers_condicionais=None):
+        """Grava a URL no arquivo em blocos, retomando com HTTP Range apos quedas
+
+        A retomada envia If-Range com o validador da primeira resposta: se o arquivo foi
+        republicado no meio do download, o servidor responde 200 e o download recomeca.
+        """
+        tamanho_total = None
+        status = None
+        headers_resposta = {}
+        validador = None
+        tentativas = 0
+        max_tentativas = self.config.get('download_tentativas', 5)
+        
+        with requests.Session() as session:
+            while True:
+                baixados = arquivo.tell()
+                headers = {
+                    "User-Agent": self.config['user_agent'],
+                    # Sem compressao de transporte: os offsets do Range sao do ZIP
+                    "Accept-Encoding": "identity"
+                }
+                if baixados:
+                    headers["Range"] = f"bytes={baixados}-"
+                    if validador:
+                        headers["If-Range"] = validador
+                elif headers_condicionais:
+                    headers.update(headers_condicionais)
+                
+                try:
+                    with session.get(url, headers=headers, stream=True,
+                                     timeout=self.config.get('timeout', 30)) as response:
+                        if response.status_code == 304:
+                            return 304, response.headers
+                        if baixados and response.status_code == 416:
+                            # Nada mais a baixar a partir desse offset
+                            break
+                        response.raise_for_status()
+                        
+                        if baixados and response.status_code != 206:
+                            # Range ignorado ou If-Range sem correspondencia (arquivo republicado)
+                            logger.warning("Servidor ignorou o Range ou o arquivo mudou, reiniciando o download")
+                            arquivo.seek(0)
+                            arquivo.truncate()
+                            baixados = 0
+                        
+                        if not baixados:
+                            # Primeira resposta (ou reinicio): metadados e validador do arquivo completo
+                            status = response.status_code
+                            headers_resposta = response.headers
+                            tamanho_total = None
+                            validador = validador_if_range(response)
+                        tamanho_total = tamanho_esperado(response, baixados) or tamanho_total
+                        
+                        for bloco in response.iter_content(self.config.get('download_chunk', 64 * 1024)):
+                            arquivo.write(bloco)
+                    
+                    if tamanho_total is None or arquivo.tell() >= tamanho_total:
+                        break
+                    
+                    raise requests.exceptions.ChunkedEncodingError(
+                        f"Conexao encerrada com {arquivo.tell()} de {tamanho_total} bytes"
+                    )
+                
+                except (requests.exceptions.ConnectionError,
+                        requests.exceptions.ChunkedEncodingError,
+                        requests.exceptions.Timeout) as e:
+                    tentativas += 1
+                    if tentativas > max_tentativas:
+                        raise
+                    logger.warning(f"Download interrompido ({e}). Retomando a partir de "
+                                   f"{arquivo.tell()} bytes (tentativa {tentativas}/{max_tentativas})")
+                    time.sleep(min(2 ** tentativas, 30))
+        
+        tamanho = arquivo.tell()
+        logger.info(f"Download concluido. Tamanho: {tamanho} bytes")
+        
+        if tamanho == 0:
+            raise ValueError("Arquivo baixado está vazio")
+        
+        if tamanho_total is not None and tamanho != tamanho_total:
+            raise ValueError(f"Tamanho do arquivo ({tamanho}) difere do esperado ({tamanho_total})")
+        
+        return status, headers_resposta
+    
     def parse_csv_data(self, zip_file):
         """Processa o arquivo CSV do COTAHIST"""
+        nome_arquivo = zip_file.namelist()[0]
+        
+        with zip_file.open(nome_arquivo) as membro:
+            dados, inicio, sha_prefixo = self._ler_apos_checkpoint(nome_arquivo, membro)
+        
+        ultimo = ultimo_registro_cotacao(dados)
+        if inicio and ultimo is None:
+            logger.info(f"Nenhum registro novo em {nome_arquivo} desde o checkpoint")
+            self.arquivo_inalterado = True
+            return pd.DataFrame()
+        
+        df = self.parse_bytes(dados)
+        
+        if inicio and not df.empty:
+            # Indice = numero da linha no arquivo completo
+            df.index = df.index + inicio // detectar_tamanho_linha(dados)
+        
+        self._preparar_checkpoint(nome_arquivo, dados, inicio, sha_prefixo, ultimo)
+        
+        return df
+    
+    def _preparar_checkpoint(self, nome_arquivo, dados, inicio, sha_prefixo, ultimo):
+        """Calcula o checkpoint do arquivo; so e gravado apos a carga no banco"""
+        if not self._usa_checkpoint() or ultimo is None:
+            return
+        
+        fim, data_ultimo = ultimo
+        sha_prefixo.update(dados[:fim])
+        self.checkpoint_pendente = (nome_arquivo, {
+            'offset': inicio + fim,
+            'data': data_ultimo,
+            'sha256': sha_prefixo.hexdigest()
+        })
+    
+    def _ler_apos_checkpoint(self, nome_arquivo, membro):
+        """Le o arquivo a partir do checkpoint, se o inicio do arquivo nao mudou"""
+        sha_prefixo = hashlib.sha256()
+        checkpoint = self._obter_checkpoint(nome_arquivo)
+        
+        if checkpoint:
+            restante = checkpoint['offset']
+            while restante > 0:
+                bloco = membro.read(min(restante, 1024 * 1024))
+                if not bloco:
+                    break
+                sha_prefixo.update(bloco)
+                restante -= len(bloco)
+            
+            if restante == 0 and sha_prefixo.hexdigest() == checkpoint['sha256']:
+                logger.info(f"Retomando {nome_arquivo} a partir do byte {checkpoint['offset']} "
+                            f"(ultima data processada: {checkpoint['data']})")
+                return membro.read(), checkpoint['offset'], sha_prefixo
+            
+            logger.warning(f"Inicio de {nome_arquivo} mudou desde o checkpoint. Processando o arquivo completo")
+            membro.seek(0)
+            sha_prefixo = hashlib.sha256()
+        
+        return membro.read(), 0, sha_prefixo
+    
+    def parse_bytes(self, dados):
+        """Processa o COTAHIST ja extraido, decodificando apenas os registros filtrados"""
+        filtro = self.resolver_filtro(dados)
+        if filtro is None:
+            logger.warning("Nenhuma data válida encontrada")
+            return pd.DataFrame()
+        
+        registros, posicoes = filtro.aplicar(dados)
+        logger.info(f"Registros selecionados nos bytes brutos: {len(registros)} ({filtro})")
+        
+        if len(registros) == 0:
+            logger.info("Nenhum registro atende ao filtro")
+            return pd.DataFrame()
+        
+        df = pd.DataFrame()
+        if self.parser_engine == 'numpy':
+            df = self._parse_numpy(lambda: registros)
+            if df.empty:
+                logger.warning("Engine numpy falhou, usando leitura com read_fwf")
+        
+        if df.empty:
+            df = self._parse_fwf(lambda: BytesIO(registros.tobytes()))
+        
+        # Indice = numero da linha no arquivo original
+        if len(df) == len(posicoes):
+            df.index = posicoes
+        return df
+    
+    def resolver_filtro(self, dados):
+        """Completa o filtro com a data alvo (D-1 ou a mais recente do arquivo)"""
+        if self.filtro.tem_datas:
+            return self.filtro
+        
+        data_alvo = resolver_data_alvo(dados, self.data_d1, self.filtro)
+        if data_alvo is None:
+            return None
+        
+        if data_alvo != self.data_d1:
+            logger.warning(f"Nenhum dado encontrado para {self.data_d1}")
+            logger.info(f"Usando data mais recente: {data_alvo}")
+        
+        return self.filtro.com_datas(data_alvo)
+    
+    def _parse_fwf(self, abrir_arquivo):
+        """Processa o COTAHIST com pandas.read_fwf"""
         try:
             logger.info("Iniciando leitura do CSV...")
             
@@ -71,38 +491,14 @@ class B3DataCollector:
                     # Tentar com posições fixas (formato COTAHIST)
                     # Posições corretas do layout COTAHIST da B3
                     df = pd.read_fwf(
-                        zip_file.open(zip_file.namelist()[0]),
-                        colspecs=[
-                            (0, 2),     # TIPREG
-                            (2, 10),    # DATA
-                            (10, 12),   # CODBDI
-                            (12, 24),   # CODNEG
-                            (24, 27),   # TPMERC
-                            (27, 39),   # NOMRES
-                            (39, 49),   # ESPECI
-                            (49, 52),   # PRAZOT
-                            (52, 56),   # MODREF
-                            (56, 69),   # PREABE
-                            (69, 82),   # PREMAX
-                            (82, 95),   # PREMIN
-                            (95, 108),  # PREMED
-                            (108, 121), # PREULT
-                            (121, 134), # PREOFC
-                            (134, 147), # PREOFV
-                            (147, 152), # TOTNEG
-                            (152, 170), # QUATOTNEG
-                            (170, 188), # VOLTOT
-                            (188, 201), # PREEXE
-                            (201, 202), # INDOPC
-                            (202, 210), # DATVEN
-                            (210, 217), # FATCOT
-                            (217, 230), # PTOEXE
-                            (230, 242), # CODISI
-                            (242, 245)  # DISMES
-                        ],
+                        abrir_arquivo(),
+                        colspecs=COTAHIST_COLSPECS,
                         names=self.config['colunas_csv'],
+                        usecols=COLUNAS_PIPELINE,
                         encoding=encoding,
-                        dtype=str  # Ler tudo como string primeiro
+                        # Texto como categoria; numeros como string, convertidos na transformacao
+                        dtype={coluna: 'category' if coluna in COLUNAS_TEXTO else str
+                               for coluna in COLUNAS_PIPELINE}
                     )
                     logger.info(f"CSV lido com encoding {encoding}. Linhas: {len(df)}")
                     break
@@ -113,7 +509,7 @@ class B3DataCollector:
             if df is None or df.empty:
                 # Fallback: tentar como CSV delimitado
                 df = pd.read_csv(
-                    zip_file.open(zip_file.namelist()[0]),
+                    abrir_arquivo(),
                     sep=";",
                     encoding="latin1",
                     names=self.config['colunas_csv'],
@@ -128,6 +524,61 @@ class B3DataCollector:
             logger.error(f"Erro ao ler CSV: {e}")
             return pd.DataFrame()
     
+    def _parse_numpy(self, ler_registros):
+        """Processa o COTAHIST como registros de largura fixa com numpy"""
+        try:
+            logger.info("Iniciando leitura do COTAHIST com engine numpy...")
+            df = registros_para_dataframe(ler_registros())
+            logger.info(f"COTAHIST lido com engine numpy. Linhas: {len(df)}")
+            return df
+        except Exception as e:
+            logger.error(f"Erro ao ler COTAHIST com engine numpy: {e}")
+            return pd.DataFrame()
+    
+    def parse_sharded(self, zip_file):
+        """Processa o COTAHIST em paralelo, um shard de registros por processo"""
+        caminho = None
+        try:
+            caminho = extrair_para_arquivo_temporario(zip_file)
+            
+            with open(caminho, 'rb') as arquivo:
+                with mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as dados:
+                    tamanho_linha = detectar_tamanho_linha(dados)
+                    filtro = self.resolver_filtro(dados)
+                    tamanho_arquivo = len(dados)
+                    self._preparar_checkpoint(zip_file.namelist()[0], dados, 0, hashlib.sha256(),
+                                              ultimo_registro_cotacao(dados))
+            
+            if filtro is None:
+                logger.warning("Nenhuma data válida encontrada")
+                return pd.DataFrame()
+            
+            shards = dividir_em_shards(tamanho_arquivo, tamanho_linha, self.parse_workers)
+            tarefas = [
+                (caminho, inicio, fim, tamanho_linha, filtro, self.parser_engine)
+                for inicio, fim in shards
+            ]
+            logger.info(f"Processando {len(tarefas)} shards com {self.parse_workers} processos...")
+            
+            with ProcessPoolExecutor(max_workers=self.parse_workers) as executor:
+                partes = list(executor.map(_processar_shard, tarefas))
+            
+            partes = [parte for parte in partes if not parte.empty]
+            if not partes:
+                logger.warning(f"Nenhum registro atende ao filtro ({filtro})")
+                return pd.DataFrame()
+            
+            df_transformed = concatenar_partes(partes)
+            logger.info(f"Parse paralelo concluido. {len(df_transformed)} registros válidos")
+            return df_transformed
+            
+        except Exception as e:
+            logger.error(f"Erro no parse paralelo: {e}")
+            return pd.DataFrame()
+        finally:
+            if caminho and os.path.exists(caminho):
+                os.remove(caminho)
+    
     def filter_d1_data(self, df):
         """Filtra dados para D-1"""
         try:
@@ -142,20 +593,32 @@ class B3DataCollector:
                 logger.warning("Nenhum registro válido encontrado")
                 return pd.DataFrame()
             
-            # Converter data - filtrar apenas valores numéricos válidos
-            df = df[df['DATA'].astype(str).str.isdigit()].copy()
-            logger.info(f"Apos filtro de datas validas: {len(df)} registros")
-            
-            if df.empty:
-                logger.warning("Nenhuma data válida encontrada")
-                return pd.DataFrame()
-            
-            # Converter para datetime
-            df['DATA'] = pd.to_datetime(df['DATA'], format='%Y%m%d', errors='coerce')
+            # O engine numpy já entrega DATA como datetime64
+            if not pd.api.types.is_datetime64_any_dtype(df['DATA']):
+                # Converter data - filtrar apenas valores numéricos válidos
+                df = df[df['DATA'].astype(str).str.isdigit()].copy()
+                logger.info(f"Apos filtro de datas validas: {len(df)} registros")
+                
+                if df.empty:
+                    logger.warning("Nenhuma data válida encontrada")
+                    return pd.DataFrame()
+                
+                # Converter para datetime
+                df['DATA'] = pd.to_datetime(df['DATA'], format='%Y%m%d', errors='coerce')
             
             # Remover registros com datas inválidas
             df = df.dropna(subset=['DATA']).copy()
             
+            # Filtro com intervalo de datas explicito (sem fallback)
+            if self.filtro.tem_datas:
+                df_filtered = df[
+                    (df['DATA'] >= pd.to_datetime(self.filtro.data_inicio)) &
+                    (df['DATA'] <= pd.to_datetime(self.filtro.data_fim))
+                ]
+                logger.info(f"Apos filtro de datas: {len(df_filtered)} registros entre "
+                            f"{self.filtro.data_inicio} e {self.filtro.data_fim}")
+                return df_filtered
+            
             # Filtrar D-1
             df_filtered = df[df['DATA'] == pd.to_datetime(self.data_d1)]
             
@@ -183,7 +646,11 @@ class B3DataCollector:
             return pd.DataFrame()
     
     def transform_data(self, df):
-        """Transforma e limpa os dados"""
+        """Transforma e limpa os dados
+
+        Representacao compacta: precos e volume em centavos (int64), negocios em int32,
+        codigo e nome como categoria. A conversao para reais acontece na gravacao no banco.
+        """
         try:
             if df.empty:
                 logger.warning("DataFrame vazio para transformação")
@@ -203,28 +670,24 @@ class B3DataCollector:
                 'DATA': 'data'
             })
             
-            # Limpar e converter tipos
-            df_transformed['codigo'] = df_transformed['codigo'].astype(str).str.strip()
-            df_transformed['nome'] = df_transformed['nome'].astype(str).str.strip()
+            # Limpar e converter tipos (texto como categoria)
+            df_transformed['codigo'] = texto_categorico(df_transformed['codigo'])
+            df_transformed['nome'] = texto_categorico(df_transformed['nome'])
             
-            # Converter preços (dividir por 100 se necessário)
-            price_columns = ['preco_abertura', 'maximo', 'minimo', 'preco_medio', 'preco_fechamento']
-            for col in price_columns:
+            # Preços e volume em centavos (inteiros, como no arquivo)
+            for col in self.config['colunas_centavos']:
                 if col in df_transformed.columns:
-                    df_transformed[col] = pd.to_numeric(df_transformed[col], errors='coerce') / 100
-            
-            # Converter volumes e quantidades
-            if 'volume_financeiro' in df_transformed.columns:
-                df_transformed['volume_financeiro'] = pd.to_numeric(df_transformed['volume_financeiro'], errors='coerce') / 100
+                    df_transformed[col] = inteiro_compacto(df_transformed[col])
             
-            if 'negocios' in df_transformed.columns:
-                df_transformed['negocios'] = pd.to_numeric(df_transformed['negocios'], errors='coerce')
+            for col in ['negocios', 'TOTNEG']:
+                if col in df_transformed.columns:
+                    df_transformed[col] = inteiro_compacto(df_transformed[col], 'int32')
             
             # O filtro TIPREG já foi aplicado na função filter_d1_data
             # Remover registros com preços zerados ou inválidos
             df_transformed = df_transformed[
-                (df_transformed['preco_fechamento'] > 0) | 
-                (df_transformed['preco_abertura'] > 0)
+                (df_transformed['preco_fechamento'] > 0).fillna(False) | 
+                (df_transformed['preco_abertura'] > 0).fillna(False)
             ]
             
             logger.info(f"Dados transformados com sucesso. {len(df_transformed)} registros válidos")
@@ -234,70 +697,64 @@ class B3DataCollector:
             logger.error(f"Erro na transformacao: {e}")
             return pd.DataFrame()
     
-    def classify_asset(self, codigo, nome):
-        """Classifica o ativo por tipo e setor baseado no código"""
+    def usa_parquet(self, zip_file):
+        """Dataset Parquet vale para o arquivo anual de um ano ja fechado, com intervalo de datas dentro dele
+
+        O arquivo do ano corrente muda a cada pregao (o sha nunca bate com o indice) e a recuperacao
+        quer poucos dias: nesses casos o parse usa o filtro de datas direto nos bytes, sem o ano inteiro.
+        """
+        return (self.parquet is not None and self.sha256_arquivo is not None
+                and self.fonte_arquivo == 'anual' and self.filtro.tem_datas
+                and not self.recuperacao
+                and self.filtro.data_inicio.year == self.filtro.data_fim.year
+                and self.filtro.data_fim.year < self.data_d1.year
+                and not self._tem_checkpoint(zip_file))
+    
+    def carregar_processado(self, zip_file, colunas=None):
+        """Cotacoes transformadas no intervalo do filtro, lidas do dataset Parquet ou do parse do ano inteiro"""
+        ano = self.filtro.data_inicio.year
+        
+        if self.parquet.disponivel(ano, self.sha256_arquivo, self.filtro):
+            logger.info(f"Arquivo de {ano} inalterado desde o ultimo parse. Lendo do dataset Parquet")
+            if self._usa_checkpoint():
+                with zip_file.open(zip_file.namelist()[0]) as membro:
+                    dados = membro.read()
+                self._preparar_checkpoint(zip_file.namelist()[0], dados, 0, hashlib.sha256(),
+                                          ultimo_registro_cotacao(dados))
+            try:
+                return self.parquet.ler(ano, self.filtro.data_inicio, self.filtro.data_fim, colunas)
+            except Exception as e:
+                logger.warning(f"Dataset Parquet de {ano} ilegivel, refazendo o parse: {e}")
+                self.parquet.remover(ano)
+        
+        # Processar o ano inteiro uma vez; o intervalo pedido e recortado depois
+        filtro = self.filtro
+        self.filtro = filtro.com_datas(date(ano, 1, 1), date(ano, 12, 31))
         try:
-            # Determinar TIPO
-            if codigo.endswith('11'):
-                tipo = 'FII'
-                # Setores de FIIs
-                nome_upper = nome.upper()
-                if any(word in nome_upper for word in ['SHOPPING', 'MALL', 'VAREJO']):
-                    setor = 'Shoppings'
-                elif any(word in nome_upper for word in ['LOGISTICO', 'LOGÍSTICA', 'GALPAO', 'GALPÃO']):
-                    setor = 'Logística'
-                elif any(word in nome_upper for word in ['CORPORATIVO', 'LAJES', 'ESCRITORIO', 'ESCRITÓRIO']):
-                    setor = 'Corporativo'
-                elif any(word in nome_upper for word in ['RESIDENCIAL', 'HABITACIONAL']):
-                    setor = 'Residencial'
-                elif any(word in nome_upper for word in ['HOSPITAL', 'SAUDE', 'SAÚDE', 'CLINICA', 'CLÍNICA']):
-                    setor = 'Saúde'
-                elif any(word in nome_upper for word in ['HOTEL', 'HOTELARIA']):
-                    setor = 'Hotelaria'
-                elif any(word in nome_upper for word in ['AGRO', 'AGRICOLA', 'AGRÍCOLA']):
-                    setor = 'Agronegócio'
-                elif any(word in nome_upper for word in ['PAPEL', 'CRI', 'CREDITO', 'CRÉDITO']):
-                    setor = 'Papel e Renda'
-                else:
-                    setor = 'Outros'
-            elif codigo.endswith(('39', '35')):
-                tipo = 'BDR'
-                setor = 'Internacional'
-            elif 'ETF' in nome.upper() or any(codigo.startswith(prefix) for prefix in ['BOVA', 'SMAL', 'IVVB']):
-                tipo = 'ETF'
-                setor = 'Índices'
+            if self.parse_workers > 1:
+                df_ano = self.parse_sharded(zip_file)
             else:
-                tipo = 'ACAO'
-                # Setores de Ações baseado no nome
-                nome_upper = nome.upper()
-                if any(word in nome_upper for word in ['PETRO', 'OLEO', 'GAS', 'COMBUSTIVEL']):
-                    setor = 'Petróleo e Gás'
-                elif any(word in nome_upper for word in ['BANCO', 'BRADESCO', 'ITAU', 'SANTANDER', 'FINANC']):
-                    setor = 'Bancos'
-                elif any(word in nome_upper for word in ['VALE', 'MINERA', 'SIDERUR', 'METAL', 'ACO', 'AÇO']):
-                    setor = 'Mineração e Siderurgia'
-                elif any(word in nome_upper for word in ['ELETRIC', 'ENERGIA', 'ENERG', 'CEMIG', 'COPEL']):
-                    setor = 'Energia Elétrica'
-                elif any(word in nome_upper for word in ['TELEFON', 'TELECOM', 'TIM', 'VIVO', 'OI']):
-                    setor = 'Telecomunicações'
-                elif any(word in nome_upper for word in ['CONSTRUC', 'CIVIL', 'MRV', 'CYRELA', 'GAFISA']):
-                    setor = 'Construção Civil'
-                elif any(word in nome_upper for word in ['VAREJO', 'MAGALU', 'VIA', 'AMERICANAS', 'LOJAS']):
-                    setor = 'Varejo'
-                elif any(word in nome_upper for word in ['ALIMENT', 'BEBIDA', 'BRF', 'AMBEV', 'JBS']):
-                    setor = 'Alimentos e Bebidas'
-                elif any(word in nome_upper for word in ['SAUDE', 'HOSPITAL', 'MEDIC', 'QUALICORP']):
-                    setor = 'Saúde'
-                elif any(word in nome_upper for word in ['PAPEL', 'CELULOSE', 'SUZANO', 'KLABIN']):
-                    setor = 'Papel e Celulose'
-                elif any(word in nome_upper for word in ['SEGUR', 'PORTO', 'SUL AMERICA']):
-                    setor = 'Seguros'
-                elif any(word in nome_upper for word in ['TRANSPORT', 'LOGISTIC', 'RUMO', 'AZUL']):
-                    setor = 'Transporte'
-                else:
-                    setor = 'Outros'
-            
-            return tipo, setor
+                df_raw = self.parse_csv_data(zip_file)
+                df_ano = self.transform_data(self.filter_d1_data(df_raw)) if not df_raw.empty else df_raw
+        finally:
+            self.filtro = filtro
+        
+        if df_ano.empty:
+            return df_ano
+        
+        try:
+            self.parquet.gravar(ano, self.sha256_arquivo, self.filtro, df_ano)
+        except Exception as e:
+            logger.warning(f"Nao foi possivel gravar o dataset Parquet de {ano}: {e}")
+        
+        df = df_ano[(df_ano['data'] >= pd.Timestamp(filtro.data_inicio)) &
+                    (df_ano['data'] <= pd.Timestamp(filtro.data_fim))]
+        return df[colunas] if colunas is not None else df
+    
+    def classify_asset(self, codigo, nome):
+        """Classifica o ativo por tipo e setor (regras em regras_classificacao.json)"""
+        try:
+            return self.classificador.classificar_um(codigo, nome)
             
         except Exception as e:
             logger.warning(f"Erro ao classificar ativo {codigo}: {e}")
@@ -309,14 +766,11 @@ class B3DataCollector:
             # Extrair ativos únicos
             df_ativos = df[['codigo', 'nome']].drop_duplicates()
             
-            # Adicionar tipo e setor
-            df_ativos['tipo'] = ''
-            df_ativos['setor'] = ''
-            
-            for idx, row in df_ativos.iterrows():
-                tipo, setor = self.classify_asset(row['codigo'], row['nome'])
-                df_ativos.at[idx, 'tipo'] = tipo
-                df_ativos.at[idx, 'setor'] = setor
+            # Adicionar tipo e setor (regras aplicadas por coluna; ativos ja conhecidos vem do cache)
+            classificacao, _ = self.classificador.classificar_com_cache(df_ativos, self.classificacoes)
+            df_ativos['tipo'] = classificacao['tipo'].astype('category')
+            df_ativos['setor'] = classificacao['setor'].astype('category')
+            df_ativos['regras_versao'] = self.classificador.versao
             
             logger.info(f"Extraidos {len(df_ativos)} ativos unicos com classificacao")
             
@@ -331,28 +785,39 @@ class B3DataCollector:
             logger.error(f"Erro ao extrair ativos: {e}")
             return pd.DataFrame()
     
+    def carregar_classificacoes(self, df_classificacoes):
+        """Semeia o cache de classificacao com os ativos ja gravados no banco"""
+        self.classificacoes = df_classificacoes if df_classificacoes is not None and not df_classificacoes.empty else None
+    
+    def filtrar_ativos_alterados(self, df_ativos):
+        """Retorna apenas os ativos novos ou com nome/tipo/setor/versao diferentes do banco"""
+        if self.classificacoes is None:
+            return df_ativos
+        
+        colunas = ['codigo', 'nome', 'tipo', 'setor', 'regras_versao']
+        comparacao = df_ativos[colunas].astype(object).merge(
+            self.classificacoes[colunas].astype(object).drop_duplicates(),
+            on=colunas, how='left', indicator=True
+        )
+        alterados = df_ativos[(comparacao['_merge'] == 'left_only').to_numpy()]
+        logger.info(f"Ativos alterados desde a ultima carga: {len(alterados)} de {len(df_ativos)}")
+        return alterados
+    
     def prepare_cotacoes(self, df, ativos_db):
-        """Prepara dados de cotacoes para insercao"""
+        """Prepara dados de cotacoes para insercao (ativos_db: MapaAtivos ou frame id, codigo)"""
         try:
-            # Garantir tipos consistentes
-            df['codigo'] = df['codigo'].astype(str)
-            ativos_db['codigo'] = ativos_db['codigo'].astype(str)
-            
-            # Fazer merge com ativos do banco
-            df_merged = df.merge(ativos_db, how='left', on='codigo')
-            
-            # Selecionar colunas para cotacoes
-            df_cotacoes = df_merged[
-                ['id', 'data', 'preco_abertura', 'preco_fechamento',
-                 'maximo', 'minimo', 'negocios', 'volume_financeiro']
-            ].rename(columns={'id': 'id_ativo'})
+            # id de cada categoria de codigo (milhares) pelo mapa de ativos, em vez de merge linha a linha
+            mapa = ativos_db if isinstance(ativos_db, MapaAtivos) else MapaAtivos(ativos_db)
+            id_ativo = mapa.resolver(df['codigo'])
             
             # Limpar dados invalidos
-            df_cotacoes = df_cotacoes.dropna(subset=['id_ativo', 'data'])
-            df_cotacoes = df_cotacoes.dropna(
-                subset=['preco_abertura', 'preco_fechamento', 'maximo', 'minimo'],
-                how='all'
-            )
+            precos = ['preco_abertura', 'preco_fechamento', 'maximo', 'minimo']
+            validos = ~np.isnan(id_ativo) & df['data'].notna().to_numpy() & df[precos].notna().any(axis=1).to_numpy()
+            
+            # Selecionar colunas para cotacoes (uma unica copia, ja filtrada)
+            df_cotacoes = df.loc[validos, ['data', 'preco_abertura', 'preco_fechamento',
+                                           'maximo', 'minimo', 'negocios', 'volume_financeiro']]
+            df_cotacoes.insert(0, 'id_ativo', id_ativo[validos].astype(np.int32))
             
             logger.info(f"Preparadas {len(df_cotacoes)} cotacoes validas")
             return df_cotacoes
@@ -389,30 +854,112 @@ class B3DataCollector:
             logger.error(f"Erro ao coletar dividendos: {e}")
             return pd.DataFrame()
 
+    def _usa_checkpoint(self):
+        """Checkpoint so vale para o arquivo anual na coleta sem datas explicitas (ou na recuperacao)"""
+        return (self.checkpoints is not None and self.fonte_arquivo == 'anual'
+                and (not self.filtro.tem_datas or self.recuperacao))
+    
+    def _obter_checkpoint(self, nome_arquivo):
+        """Checkpoint utilizavel do arquivo; na recuperacao, so se for anterior ao intervalo"""
+        if not self._usa_checkpoint():
+            return None
+        
+        checkpoint = self.checkpoints.obter(nome_arquivo)
+        if checkpoint and self.filtro.tem_datas and checkpoint['data'] >= self.filtro.data_inicio.strftime('%Y%m%d'):
+            logger.info(f"Checkpoint de {nome_arquivo} ({checkpoint['data']}) posterior ao inicio "
+                        f"da recuperacao. Processando o arquivo completo")
+            return None
+        return checkpoint
+    
+    def _tem_checkpoint(self, zip_file):
+        """Indica se ha checkpoint para o arquivo (a cauda e processada em serie)"""
+        return self._obter_checkpoint(zip_file.namelist()[0]) is not None
+    
+    def configurar_recuperacao(self, ultima_data):
+        """Inclui na coleta os pregoes perdidos entre a ultima data carregada e D-1"""
+        if ultima_data is None or ultima_data >= self.data_d1:
+            return False
+        
+        inicio = ultima_data + timedelta(days=1)
+        # Sem dia util entre a ultima carga e D-1: coleta normal de D-1
+        if np.busday_count(inicio, self.data_d1) == 0:
+            return False
+        
+        if inicio.year < self.data_d1.year:
+            logger.warning(f"Dias perdidos desde {inicio} incluem o ano anterior. Use o backfill "
+                           f"(main.py --backfill {inicio} {self.data_d1.year - 1}-12-31) para carrega-los")
+            inicio = date(self.data_d1.year, 1, 1)
+        
+        self.filtro = self.filtro.com_datas(inicio, self.data_d1)
+        self.recuperacao = True
+        logger.info(f"Recuperando dias perdidos: ultima data no banco {ultima_data}, "
+                    f"coletando de {inicio} a {self.data_d1}")
+        return True
+    
+    def download_fonte(self):
+        """Baixa o COTAHIST da fonte configurada (diario com fallback para o anual)"""
+        if self.config.get('fonte_cotahist', 'anual') == 'diario' and not self.filtro.tem_datas:
+            self.fonte_arquivo = 'diario'
+            zip_file = self.download_cotahist(get_cotahist_daily_url(self.data_d1))
+            if zip_file is not None or self.arquivo_inalterado:
+                return zip_file
+            logger.warning(f"COTAHIST diario de {self.data_d1} indisponivel. Usando o arquivo anual")
+        
+        self.fonte_arquivo = 'anual'
+        return self.download_cotahist()
+    
+    def confirmar_ingestao(self):
+        """Marca o arquivo processado como ingerido apos a carga no banco"""
+        if self.cache is not None and self.url_arquivo and self.sha256_arquivo:
+            self.cache.marcar_ingerido(self.url_arquivo, self.sha256_arquivo)
+            logger.info(f"Arquivo marcado como ingerido: {self.url_arquivo}")
+        
+        if self.checkpoints is not None and self.checkpoint_pendente:
+            self.checkpoints.salvar(*self.checkpoint_pendente)
+            self.checkpoint_pendente = None
+    
+    def _sem_cotacoes_novas(self):
+        """Na recuperacao, intervalo sem pregoes no arquivo nao e erro: nada a ingerir"""
+        if self.recuperacao:
+            logger.info(f"Nenhum pregao entre {self.filtro.data_inicio} e {self.filtro.data_fim} no arquivo")
+            self.arquivo_inalterado = True
+        return None, None, None
+    
     def collect_and_process_data(self):
         """Metodo principal para coleta e processamento"""
         try:
             logger.info(f"Iniciando coleta para D-1: {self.data_d1}")
             
             # 1. Download
-            zip_file = self.download_cotahist()
+            zip_file = self.download_fonte()
             if zip_file is None:
                 return None, None, None
             
-            # 2. Parse CSV
-            df_raw = self.parse_csv_data(zip_file)
-            if df_raw.empty:
-                return None, None, None
-            
-            # 3. Filtrar D-1
-            df_filtered = self.filter_d1_data(df_raw)
-            if df_filtered.empty:
-                return None, None, None
-            
-            # 4. Transformar
-            df_transformed = self.transform_data(df_filtered)
-            if df_transformed.empty:
-                return None, None, None
+            if self.usa_parquet(zip_file):
+                # 2-4. Ano ja processado (Parquet) ou parse do ano inteiro, gravado para as proximas cargas
+                df_transformed = self.carregar_processado(zip_file)
+                if df_transformed.empty:
+                    return self._sem_cotacoes_novas()
+            elif self.parse_workers > 1 and not self._tem_checkpoint(zip_file):
+                # 2-4. Parse, filtro D-1 e transformacao em paralelo
+                df_transformed = self.parse_sharded(zip_file)
+                if df_transformed.empty:
+                    return self._sem_cotacoes_novas()
+            else:
+                # 2. Parse CSV
+                df_raw = self.parse_csv_data(zip_file)
+                if df_raw.empty:
+                    return self._sem_cotacoes_novas()
+                
+                # 3. Filtrar D-1 (ou o intervalo da recuperacao)
+                df_filtered = self.filter_d1_data(df_raw)
+                if df_filtered.empty:
+                    return self._sem_cotacoes_novas()
+                
+                # 4. Transformar
+                df_transformed = self.transform_data(df_filtered)
+                if df_transformed.empty:
+                    return None, None, None
             
             # 5. Extrair ativos
             df_ativos = self.extract_ativos(df_transformed)
@@ -35,6 +35,9 @@ class DataIngestionWorkflow:
             # 2. Coletar e processar dados
             df_transformed, df_ativos, df_dividendos = self._collect_and_process_data()
             if df_transformed is None:
+                if self.data_collector.arquivo_inalterado:
+                    logger.info("=== NENHUMA COTACAO NOVA NA B3. NADA A INGERIR ===")
+                    return True
                 return False
             
             # 3. Processar ativos
@@ -49,6 +52,9 @@ class DataIngestionWorkflow:
             if not self._process_dividendos(df_dividendos):
                 return False
             
+            # 6. Registrar o arquivo como ingerido (proximas execucoes pulam se nada mudar)
+            self.data_collector.confirmar_ingestao()
+            
             logger.info("=== WORKFLOW DE INGESTAO CONCLUIDO COM SUCESSO ===")
             return True
             
@@ -75,8 +81,18 @@ class DataIngestionWorkflow:
         """Coleta e processa dados da B3"""
         logger.info("Iniciando coleta de dados da B3...")
         
+        # Dias perdidos (feriado prolongado, falha) entram na mesma passada pelo arquivo anual
+        ultima_data = self.db_manager.get_ultima_data_cotacoes()
+        self.data_collector.configurar_recuperacao(ultima_data)
+        
+        # Ativos ja classificados nao passam de novo pelas regras
+        self.data_collector.carregar_classificacoes(self.db_manager.get_classificacao_ativos())
+        
         df_transformed, df_ativos, df_dividendos = self.data_collector.collect_and_process_data()
         
+        if self.data_collector.arquivo_inalterado:
+            return None, None, None
+        
         if df_transformed is None or df_ativos is None:
             logger.error("Falha na coleta/processamento de dados")
             return None, None, None
@@ -88,8 +104,10 @@ class DataIngestionWorkflow:
         logger.info("Sincronizando ativos com tipo e setor...")
         
         try:
-            # Sincronizar todos os ativos (inserir novos, atualizar existentes, remover inativos)
-            if not self.db_manager.sync_ativos(df_ativos):
+            # Gravar so os ativos novos/alterados; a remocao de inativos considera a coleta inteira
+            df_alterados = self.data_collector.filtrar_ativos_alterados(df_ativos)
+            # O mapa codigo -> id retornado fica no db_manager para cotacoes e dividendos
+            if self.db_manager.sync_ativos(df_alterados, codigos_atuais=df_ativos['codigo'].tolist()) is None:
                 logger.error("Falha ao sincronizar ativos")
                 return False
             
@@ -104,18 +122,18 @@ class DataIngestionWorkflow:
         logger.info("Processando cotacoes...")
         
         try:
-            # Buscar ativos atualizados do banco
-            ativos_db = self.db_manager.get_existing_ativos()
+            # Mapa codigo -> id do sync_ativos (banco so para codigos ausentes)
+            mapa = self.db_manager.get_mapa_ativos(df_transformed['codigo'])
             
             # Preparar cotacoes
-            df_cotacoes = self.data_collector.prepare_cotacoes(df_transformed, ativos_db)
+            df_cotacoes = self.data_collector.prepare_cotacoes(df_transformed, mapa)
             
             if df_cotacoes.empty:
                 logger.warning("Nenhuma cotacao valida para processar")
                 return True
             
-            # Inserir cotacoes
-            if not self.db_manager.insert_cotacoes(df_cotacoes, self.data_d1):
+            # Inserir cotacoes (substitui todas as datas do lote em uma unica carga)
+            if not self.db_manager.insert_cotacoes(df_cotacoes):
                 logger.error("Falha ao inserir cotacoes")
                 return False
             
@@ -134,11 +152,11 @@ class DataIngestionWorkflow:
                 logger.info("Nenhum dividendo para processar")
                 return True
             
-            # Buscar ativos atualizados do banco
-            ativos_db = self.db_manager.get_existing_ativos()
+            # Mesmo mapa usado nas cotacoes
+            mapa = self.db_manager.get_mapa_ativos(df_dividendos['codigo'])
             
             # Inserir dividendos
-            if not self.db_manager.insert_dividendos(df_dividendos, ativos_db):
+            if not self.db_manager.insert_dividendos(df_dividendos, mapa):
                 logger.error("Falha ao inserir dividendos")
                 return False
             
@@ -2,19 +2,95 @@
 # MODULO: OPERACOES DE BANCO DE DADOS
 # ====================================
 
+import csv
 import pandas as pd
 import logging
-from config import engine
+import time
+import uuid
+from io import BytesIO, StringIO
+from config import engine, B3_CONFIG, CARGA_CONFIG, CONSULTA_CONFIG, PARTICIONAMENTO_CONFIG, ESTATISTICAS_CONFIG
+from mapa_ativos import MapaAtivos
+from migration_manager import MigrationManager
+from consultas_preparadas import ConsultasPreparadas, registrar
+from consultas_relatorios import sql
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Tabelas do resumo do sistema (contadores em estatisticas_tabelas; cotacoes por pregao)
+TABELAS_ESTATISTICAS = ['ativos', 'cotacoes', 'dividendos']
+
+# Tipos das colunas conhecidas no caminho tipado (COPY) de execute_query
+# (inteiros nulaveis: um LEFT JOIN pode devolver NULL em id_ativo, ano ou mes)
+TIPOS_COLUNAS = {
+    'id_ativo': 'Int32',
+    'codigo': 'str', 'nome': 'str', 'tipo': 'str', 'setor': 'str',
+    'data': 'datetime64[ns]',
+    'preco_abertura': 'float64', 'preco_fechamento': 'float64',
+    'maximo': 'float64', 'minimo': 'float64',
+    'negocios': 'Int32',
+    'volume_financeiro': 'float64', 'valor': 'float64',
+    'ano': 'Int32', 'mes': 'Int32'
+}
+
+COLUNAS_COTACOES = ['id_ativo', 'data', 'preco_abertura', 'preco_fechamento',
+                    'maximo', 'minimo', 'negocios', 'volume_financeiro']
+
+# cotacoes particionada por mes; a chave unica precisa conter a coluna de particao (data)
+COTACOES_PARTICIONADA_DDL = """
+    CREATE TABLE cotacoes (
+        id bigint NOT NULL DEFAULT nextval('{sequencia}'),
+        id_ativo int NOT NULL REFERENCES ativos(id),
+        data date NOT NULL,
+        preco_abertura numeric(18,4),
+        preco_fechamento numeric(18,4),
+        maximo numeric(18,4),
+        minimo numeric(18,4),
+        negocios int,
+        volume_financeiro numeric(20,2),
+        PRIMARY KEY (id_ativo, data)
+    ) PARTITION BY RANGE (data);
+    CREATE INDEX cotacoes_data_idx ON cotacoes (data);
+    CREATE INDEX cotacoes_ativo_data_desc_idx ON cotacoes (id_ativo, data DESC) INCLUDE (preco_fechamento);
+    CREATE INDEX cotacoes_data_brin ON cotacoes USING brin (data);
+"""
+
+
+def ler_csv_tipado(buffer, tipos, codificacao='utf-8'):
+    """Le o CSV (com cabecalho) de um COPY ... TO STDOUT nos tipos dados por coluna
+
+    Campos vazios (NULL) viram NA; datetime64 e convertido com formato fixo.
+    """
+    colunas = next(csv.reader([buffer.readline().decode(codificacao)]))
+    buffer.seek(0)
+    
+    datas = [coluna for coluna in colunas if pd.api.types.is_datetime64_any_dtype(tipos.get(coluna))]
+    dtypes = {coluna: tipos[coluna] for coluna in colunas if coluna in tipos and coluna not in datas}
+    df = pd.read_csv(buffer, dtype=dtypes, encoding=codificacao)
+    for coluna in datas:
+        df[coluna] = pd.to_datetime(df[coluna], format='%Y-%m-%d')
+    return df
+
+
+def meses_das_datas(datas):
+    """Primeiro dia de cada mes distinto das datas (AAAA-MM-DD ou date)"""
+    return sorted({pd.Timestamp(data).to_period('M').start_time.date() for data in datas})
+
 class DatabaseManager:
     """Gerenciador de operacoes do banco de dados"""
     
     def __init__(self):
         self.engine = engine
+        # Mapa codigo -> id compartilhado pelas etapas; alimentado pelo sync_ativos
+        self.mapa_ativos = MapaAtivos()
+        # Layout de cotacoes (None = ainda nao consultado) e particoes mensais ja garantidas
+        self._particionada = None
+        self._particoes = set()
+        # Migracoes versionadas do schema (conferidas uma vez por processo)
+        self.migracoes = MigrationManager()
+        # Consultas dos relatorios preparadas por conexao do pool (com metricas de latencia)
+        self.preparadas = ConsultasPreparadas()
     
     def test_connection(self):
         """Testa a conexao com o banco de dados"""
@@ -45,209 +121,530 @@ class DatabaseManager:
             logger.error(f"Erro ao buscar ativos: {e}")
             return pd.DataFrame()
     
-    def sync_ativos(self, df_ativos_novos):
-        """Sincroniza completamente a tabela de ativos com tipo e setor"""
+    def get_mapa_ativos(self, codigos=None):
+        """Mapa codigo -> id dos ativos; vai ao banco so pelo que ainda nao esta no mapa
+
+        Sem codigos, garante o mapa completo. Com codigos, busca apenas os ausentes.
+        """
         try:
-            if df_ativos_novos.empty:
-                logger.info("Nenhum ativo para sincronizar")
-                return True
+            if self.mapa_ativos.carregado:
+                return self.mapa_ativos
+            
+            if codigos is None:
+                df = self.get_existing_ativos()
+                if not df.empty:
+                    self.mapa_ativos.carregar(df)
+                return self.mapa_ativos
             
+            faltantes = self.mapa_ativos.faltantes(codigos)
+            if faltantes:
+                from sqlalchemy import text
+                df = pd.read_sql(text("SELECT id, codigo FROM ativos WHERE codigo = ANY(:codigos)"),
+                                 self.engine, params={'codigos': faltantes})
+                self.mapa_ativos.atualizar(df)
+            return self.mapa_ativos
+        except Exception as e:
+            logger.error(f"Erro ao buscar mapa de ativos: {e}")
+            return self.mapa_ativos
+    
+    def get_ultima_data_cotacoes(self):
+        """Retorna a data mais recente carregada em cotacoes (None se vazia)"""
+        try:
             from sqlalchemy import text
+            with self.engine.connect() as conn:
+                ultima = conn.execute(text("SELECT MAX(data) FROM cotacoes")).scalar()
+            if ultima is None:
+                return None
+            return pd.Timestamp(ultima).date()
+        except Exception as e:
+            logger.error(f"Erro ao buscar ultima data de cotacoes: {e}")
+            return None
+    
+    def get_classificacao_ativos(self):
+        """Busca a classificacao gravada dos ativos (cache de tipo/setor por codigo e nome)"""
+        try:
+            query = "SELECT codigo, nome, tipo, setor, regras_versao FROM ativos"
+            df = pd.read_sql(query, self.engine)
+            logger.info(f"Classificacao de {len(df)} ativos carregada do banco")
+            return df
+        except Exception as e:
+            # Ex.: banco ainda sem as migracoes aplicadas (sem a coluna regras_versao)
+            logger.warning(f"Classificacao dos ativos indisponivel: {e}")
+            return pd.DataFrame()
+    
+    def sync_ativos(self, df_ativos_novos, remover_inativos=True, codigos_atuais=None):
+        """Sincroniza a tabela de ativos com tipo e setor
+
+        df_ativos_novos: ativos a inserir/atualizar (podem ser so os alterados).
+        codigos_atuais: todos os codigos da coleta, usados na remocao de inativos
+        (por padrao, os codigos de df_ativos_novos).
+        Retorna o mapa codigo -> id (colunas id, codigo) dos ativos da coleta, ou None em caso de erro.
+        """
+        try:
+            if df_ativos_novos.empty and codigos_atuais is None:
+                logger.info("Nenhum ativo para sincronizar")
+                return pd.DataFrame(columns=['id', 'codigo'])
             
             with self.engine.connect() as conn:
-                # 1. Primeiro, garantir que as colunas tipo e setor existem
-                try:
-                    conn.execute(text("ALTER TABLE ativos ADD COLUMN IF NOT EXISTS tipo VARCHAR(20)"))
-                    conn.execute(text("ALTER TABLE ativos ADD COLUMN IF NOT EXISTS setor VARCHAR(80)"))
-                    conn.commit()
-                    logger.info("Colunas tipo e setor verificadas/criadas")
-                except Exception as e:
-                    logger.warning(f"Erro ao adicionar colunas (podem já existir): {e}")
+                # 1. Carregar ativos e codigos da coleta em tabelas temporarias (COPY)
+                logger.info(f"Sincronizando {len(df_ativos_novos)} ativos...")
+                colunas = ['codigo', 'nome', 'tipo', 'setor', 'regras_versao']
+                codigos = codigos_atuais if codigos_atuais is not None else df_ativos_novos['codigo']
+                df_codigos = pd.DataFrame({'codigo': pd.unique(pd.Series(codigos, dtype=object).astype(str))})
                 
-                # 2. Remover coluna quantidade se existir (migração)
-                try:
-                    # Verificar se a coluna existe antes de tentar remover
-                    result = conn.execute(text("""
-                        SELECT column_name FROM information_schema.columns 
-                        WHERE table_name = 'cotacoes' AND column_name = 'quantidade'
-                    """))
-                    if result.fetchone():
-                        conn.execute(text("ALTER TABLE cotacoes DROP COLUMN quantidade"))
-                        conn.commit()
-                        logger.info("Coluna 'quantidade' removida da tabela cotacoes")
-                except Exception as e:
-                    logger.warning(f"Erro ao remover coluna quantidade (pode não existir): {e}")
+                # Conexao DBAPI (psycopg2) da mesma sessao: COPY e commit direto nela
+                conexao = conn.connection
+                cursor = conexao.cursor()
+                cursor.execute("""
+                    CREATE TEMP TABLE ativos_carga (
+                        codigo varchar(12), nome varchar(120), tipo varchar(20),
+                        setor varchar(80), regras_versao varchar(16), ordem int
+                    ) ON COMMIT DROP;
+                    CREATE TEMP TABLE codigos_coleta (codigo varchar(12) primary key) ON COMMIT DROP;
+                """)
+                # ordem: posicao no frame, para que a ultima linha de um codigo repetido prevaleca
+                df_carga = df_ativos_novos.reindex(columns=colunas).assign(ordem=range(len(df_ativos_novos)))
+                self._copy_frame(cursor, 'ativos_carga', df_carga)
+                self._copy_frame(cursor, 'codigos_coleta', df_codigos)
                 
-                # 3. Inserir/Atualizar ativos usando UPSERT
-                logger.info(f"Sincronizando {len(df_ativos_novos)} ativos...")
-                for _, row in df_ativos_novos.iterrows():
-                    upsert_query = text("""
-                        INSERT INTO ativos (codigo, nome, tipo, setor)
-                        VALUES (:codigo, :nome, :tipo, :setor)
-                        ON CONFLICT (codigo) 
-                        DO UPDATE SET 
+                # 2. Um unico UPSERT: so grava linhas com nome/tipo/setor/versao diferentes.
+                # O SELECT externo ve o snapshot anterior ao UPSERT: completa o mapa com os inalterados
+                cursor.execute("""
+                    WITH upsert AS (
+                        INSERT INTO ativos (codigo, nome, tipo, setor, regras_versao)
+                        SELECT DISTINCT ON (codigo) codigo, nome, tipo, setor, regras_versao
+                        FROM ativos_carga
+                        ORDER BY codigo, ordem DESC
+                        ON CONFLICT (codigo)
+                        DO UPDATE SET
                             nome = EXCLUDED.nome,
                             tipo = EXCLUDED.tipo,
-                            setor = EXCLUDED.setor
-                    """)
-                    
-                    conn.execute(upsert_query, {
-                        'codigo': row['codigo'],
-                        'nome': row['nome'],
-                        'tipo': row['tipo'],
-                        'setor': row['setor']
-                    })
-                
-                # 3. Remover ativos que não estão mais na coleta atual
-                # Buscar códigos atuais no banco
-                current_codes_result = conn.execute(text("SELECT codigo FROM ativos"))
-                current_codes_db = [row[0] for row in current_codes_result.fetchall()]
-                
-                # Códigos da nova coleta
-                new_codes = set(df_ativos_novos['codigo'].tolist())
-                codes_to_remove = [code for code in current_codes_db if code not in new_codes]
+                            setor = EXCLUDED.setor,
+                            regras_versao = EXCLUDED.regras_versao
+                        WHERE (ativos.nome, ativos.tipo, ativos.setor, ativos.regras_versao)
+                              IS DISTINCT FROM
+                              (EXCLUDED.nome, EXCLUDED.tipo, EXCLUDED.setor, EXCLUDED.regras_versao)
+                        RETURNING id, codigo, (xmax = 0) AS inserido
+                    )
+                    SELECT id, codigo, inserido FROM upsert
+                    UNION ALL
+                    SELECT a.id, a.codigo, false
+                    FROM ativos a
+                    WHERE (a.codigo IN (SELECT codigo FROM codigos_coleta)
+                           OR a.codigo IN (SELECT codigo FROM ativos_carga))
+                      AND a.codigo NOT IN (SELECT codigo FROM upsert)
+                """)
+                gravados = cursor.rowcount
+                df_mapa = pd.DataFrame(cursor.fetchall(), columns=['id', 'codigo', 'inserido'])
+                inseridos = int(df_mapa.pop('inserido').sum())
                 
+                # 3. Remover, com um anti-join, ativos fora da coleta e sem dados historicos
                 removed_count = 0
-                if codes_to_remove:
-                    for code in codes_to_remove:
-                        # Verificar se o ativo tem cotações ou dividendos antes de remover
-                        has_data = conn.execute(text("""
-                            SELECT 1 FROM cotacoes c 
-                            JOIN ativos a ON c.id_ativo = a.id 
-                            WHERE a.codigo = :codigo 
-                            LIMIT 1
-                        """), {'codigo': code}).fetchone()
-                        
-                        if not has_data:
-                            # Só remove se não tiver dados históricos
-                            conn.execute(text("DELETE FROM ativos WHERE codigo = :codigo"), {'codigo': code})
-                            removed_count += 1
+                if remover_inativos:
+                    cursor.execute("""
+                        DELETE FROM ativos a
+                        WHERE NOT EXISTS (SELECT 1 FROM codigos_coleta c WHERE c.codigo = a.codigo)
+                          AND NOT EXISTS (SELECT 1 FROM cotacoes q WHERE q.id_ativo = a.id)
+                          AND NOT EXISTS (SELECT 1 FROM dividendos d WHERE d.id_ativo = a.id)
+                    """)
+                    removed_count = cursor.rowcount
+                
+                self._somar_contador(cursor, 'ativos', inseridos - removed_count)
+                cursor.close()
+                conexao.commit()
                 
-                conn.commit()
+                # Ativos removidos invalidam o mapa; os ids da coleta entram em seguida
+                if removed_count:
+                    self.mapa_ativos.invalidar()
+                self.mapa_ativos.atualizar(df_mapa)
                 
                 logger.info(f"Sincronização de ativos concluída:")
-                logger.info(f"- {len(df_ativos_novos)} ativos atualizados/inseridos")
+                logger.info(f"- {len(df_ativos_novos)} ativos recebidos, {len(df_mapa)} no mapa de ids "
+                            f"({gravados} linhas retornadas)")
                 logger.info(f"- {removed_count} ativos sem dados removidos")
                 
-                return True
+                return df_mapa
                 
         except Exception as e:
             logger.error(f"Erro ao sincronizar ativos: {e}")
             import traceback
             logger.error(f"Traceback: {traceback.format_exc()}")
-            return False
+            return None
     
-    def insert_cotacoes(self, df_cotacoes, data_referencia):
-        """Insere ou atualiza cotacoes no banco"""
+    def _copy_frame(self, cursor, tabela, df):
+        """Envia o frame para a tabela com COPY (CSV; valores nulos viram NULL)"""
+        buffer = StringIO()
+        df.to_csv(buffer, index=False, header=False, date_format='%Y-%m-%d')
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {tabela} ({', '.join(df.columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    
+    def insert_cotacoes(self, df_cotacoes, data_referencia=None):
+        """Substitui os pregoes do lote em cotacoes (todas as datas do frame, mais a data de referencia)"""
         try:
             if df_cotacoes.empty:
                 logger.warning("Nenhuma cotacao para inserir")
                 return False
             
-            data_str = data_referencia.strftime('%Y-%m-%d')
+            datas = set(pd.to_datetime(df_cotacoes['data']).dt.strftime('%Y-%m-%d').unique())
+            if data_referencia is not None:
+                datas.add(data_referencia.strftime('%Y-%m-%d'))
+            datas = sorted(datas)
+            data_str = datas[0] if len(datas) == 1 else f"{datas[0]} a {datas[-1]} ({len(datas)} datas)"
+            
+            # Precos e volume chegam do coletor em centavos
+            df_cotacoes = self._centavos_para_reais(df_cotacoes)
+            # Chave repetida no lote: vale a ultima linha, como no upsert anterior
+            df_cotacoes = df_cotacoes.drop_duplicates(subset=['id_ativo', 'data'], keep='last')
+            
+            inicio = time.perf_counter()
+            removidas, total_inserted, modo = self._substituir_pregoes(df_cotacoes, datas)
+            duracao = max(time.perf_counter() - inicio, 1e-9)
+            
+            logger.info(f"Removidas {removidas} cotacoes existentes para {data_str}")
+            logger.info(f"Inseridas {total_inserted} cotacoes para {data_str} via {modo} "
+                        f"em {duracao:.2f} s ({total_inserted / duracao:,.0f} linhas/s)")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Erro ao inserir cotacoes: {e}")
+            return False
+    
+    def _substituir_pregoes(self, df_cotacoes, datas):
+        """Apaga e recarrega os pregoes em uma unica transacao (leitores veem o dia antigo ou o novo)"""
+        conexao = self.engine.raw_connection()
+        try:
+            cursor = conexao.cursor()
+            # Uma substituicao por vez: cargas concorrentes do mesmo dia nao colidem na chave unica
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext('cotacoes_carga'))")
+            
+            # Com cotacoes particionada, cria as particoes dos meses do lote na mesma transacao
+            if self.cotacoes_particionada():
+                self._criar_particoes(cursor, meses_das_datas(datas))
+            
+            # Predicado direto na coluna date: usa o indice de data (sem DATE(data))
+            cursor.execute("DELETE FROM cotacoes WHERE data = ANY(%s::date[])", (datas,))
+            removidas = cursor.rowcount
+            
+            # Os dias do lote acabaram de ser apagados: INSERT simples, sem ON CONFLICT
+            if len(df_cotacoes) >= CARGA_CONFIG.get('copy_min_linhas', 5000):
+                inseridas, modo = self._copy_cotacoes(cursor, df_cotacoes), 'COPY'
+            else:
+                inseridas, modo = self._insert_values_cotacoes(cursor, df_cotacoes), 'INSERT'
+            
+            # cotacoes_ultima e as estatisticas acompanham a carga na mesma transacao
+            self._atualizar_ultima(cursor, datas)
+            self._atualizar_pregoes(cursor, datas)
             
-            # Sempre remover cotações existentes da data primeiro
+            conexao.commit()
+            cursor.close()
+            return removidas, inseridas, modo
+        except Exception:
+            conexao.rollback()
+            # Particoes criadas nessa transacao foram desfeitas
+            self._particoes = set()
+            raise
+        finally:
+            conexao.close()
+    
+    def _atualizar_ultima(self, cursor, datas):
+        """Atualiza cotacoes_ultima com os pregoes recarregados (so avanca a data de cada ativo)"""
+        colunas = ', '.join(COLUNAS_COTACOES)
+        
+        # Ativos cuja ultima cotacao era de um dia recarregado e que sairam dele: volta ao pregao anterior
+        cursor.execute("""
+            DELETE FROM cotacoes_ultima u
+            WHERE u.data = ANY(%s::date[])
+            AND NOT EXISTS (SELECT 1 FROM cotacoes c WHERE c.id_ativo = u.id_ativo AND c.data = u.data)
+            RETURNING u.id_ativo
+        """, (datas,))
+        orfaos = [linha[0] for linha in cursor.fetchall()]
+        if orfaos:
+            cursor.execute(f"""
+                INSERT INTO cotacoes_ultima ({colunas})
+                SELECT c.* FROM unnest(%s::int[]) AS o(id_ativo)
+                CROSS JOIN LATERAL (
+                    SELECT {colunas} FROM cotacoes
+                    WHERE id_ativo = o.id_ativo
+                    ORDER BY data DESC
+                    LIMIT 1
+                ) c
+            """, (orfaos,))
+        
+        # Le so os dias do lote (indice de data), nunca o historico inteiro
+        atualizacoes = ', '.join(f"{coluna} = EXCLUDED.{coluna}" for coluna in COLUNAS_COTACOES[1:])
+        cursor.execute(f"""
+            INSERT INTO cotacoes_ultima ({colunas})
+            SELECT DISTINCT ON (id_ativo) {colunas}
+            FROM cotacoes
+            WHERE data = ANY(%s::date[])
+            ORDER BY id_ativo, data DESC
+            ON CONFLICT (id_ativo) DO UPDATE SET {atualizacoes}
+            WHERE EXCLUDED.data >= cotacoes_ultima.data
+        """, (datas,))
+    
+    def _atualizar_pregoes(self, cursor, datas):
+        """Recontagem das linhas dos pregoes recarregados em cotacoes_pregoes (so os dias do lote)"""
+        cursor.execute("DELETE FROM cotacoes_pregoes WHERE data = ANY(%s::date[])", (datas,))
+        cursor.execute("""
+            INSERT INTO cotacoes_pregoes (data, registros)
+            SELECT data, count(*) FROM cotacoes
+            WHERE data = ANY(%s::date[])
+            GROUP BY data
+        """, (datas,))
+    
+    def _somar_contador(self, cursor, tabela, delta):
+        """Soma delta ao contador exato da tabela em estatisticas_tabelas"""
+        if delta:
+            cursor.execute("""
+                UPDATE estatisticas_tabelas
+                SET registros = registros + %s, atualizado_em = now()
+                WHERE tabela = %s
+            """, (int(delta), tabela))
+    
+    def cotacoes_particionada(self):
+        """Indica se cotacoes e uma tabela particionada (consulta o catalogo uma vez)"""
+        if self._particionada is None:
             from sqlalchemy import text
             with self.engine.connect() as conn:
-                # Usar formato de data mais específico
-                result = conn.execute(text("DELETE FROM cotacoes WHERE DATE(data) = :target_date"), 
-                                    {'target_date': data_str})
-                deleted_count = result.rowcount
-                conn.commit()
-                
-                logger.info(f"Removidas {deleted_count} cotacoes existentes para {data_str}")
-                
-                # Verificar se ainda existem duplicatas
-                check_result = conn.execute(text("SELECT COUNT(*) as count FROM cotacoes WHERE DATE(data) = :target_date"), 
-                                          {'target_date': data_str})
-                remaining = check_result.fetchone()[0]
-                
-                if remaining > 0:
-                    logger.warning(f"Ainda existem {remaining} cotacoes para {data_str}. Removendo novamente...")
-                    conn.execute(text("DELETE FROM cotacoes WHERE DATE(data) = :target_date"), 
-                               {'target_date': data_str})
-                    conn.commit()
+                self._particionada = bool(conn.execute(text("""
+                    SELECT EXISTS (
+                        SELECT 1 FROM pg_partitioned_table p
+                        JOIN pg_class c ON c.oid = p.partrelid
+                        WHERE c.relname = 'cotacoes' AND c.relnamespace = 'public'::regnamespace
+                    )
+                """)).scalar())
+        return self._particionada
+    
+    def _criar_particoes(self, cursor, meses):
+        """Cria as particoes mensais de cotacoes que ainda nao existem"""
+        for mes in meses:
+            if mes in self._particoes:
+                continue
+            proximo = (pd.Timestamp(mes) + pd.offsets.MonthBegin(1)).date()
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS cotacoes_{mes:%Y_%m} PARTITION OF cotacoes
+                FOR VALUES FROM ('{mes:%Y-%m-%d}') TO ('{proximo:%Y-%m-%d}')
+            """)
+            self._particoes.add(mes)
+    
+    def migrar_cotacoes_particionada(self, manter_antiga=False):
+        """Converte a tabela cotacoes plana em particionada por mes, em uma unica transacao"""
+        if self.cotacoes_particionada():
+            logger.info("Tabela cotacoes ja e particionada")
+            return True
+        
+        conexao = self.engine.raw_connection()
+        try:
+            cursor = conexao.cursor()
+            inicio = time.perf_counter()
+            cursor.execute("LOCK TABLE cotacoes IN ACCESS EXCLUSIVE MODE")
             
-            # Inserir dados usando inserção em lotes para melhor performance
-            batch_size = 1000
-            total_inserted = 0
+            # A tabela antiga sai do caminho junto com os indices (nomes de indice sao unicos no schema)
+            cursor.execute("ALTER TABLE cotacoes RENAME TO cotacoes_plana")
+            cursor.execute("SELECT indexname FROM pg_indexes WHERE schemaname = 'public' AND tablename = 'cotacoes_plana'")
+            for (indice,) in cursor.fetchall():
+                cursor.execute(f'ALTER INDEX "{indice}" RENAME TO "plana_{indice}"')
             
-            with self.engine.connect() as conn:
-                for i in range(0, len(df_cotacoes), batch_size):
-                    batch = df_cotacoes.iloc[i:i+batch_size]
-                    
-                    # Preparar dados para inserção
-                    insert_data = []
-                    for _, row in batch.iterrows():
-                        insert_data.append({
-                            'id_ativo': int(row['id_ativo']),
-                            'data': row['data'],
-                            'preco_abertura': float(row['preco_abertura']) if pd.notna(row['preco_abertura']) else None,
-                            'preco_fechamento': float(row['preco_fechamento']) if pd.notna(row['preco_fechamento']) else None,
-                            'maximo': float(row['maximo']) if pd.notna(row['maximo']) else None,
-                            'minimo': float(row['minimo']) if pd.notna(row['minimo']) else None,
-                            'negocios': int(row['negocios']) if pd.notna(row['negocios']) else None,
-                            'volume_financeiro': float(row['volume_financeiro']) if pd.notna(row['volume_financeiro']) else None
-                        })
-                    
-                    # Inserir lote com UPSERT (evita duplicatas)
-                    conn.execute(text("""
-                        INSERT INTO cotacoes (id_ativo, data, preco_abertura, preco_fechamento, 
-                                            maximo, minimo, negocios, volume_financeiro)
-                        VALUES (:id_ativo, :data, :preco_abertura, :preco_fechamento,
-                                :maximo, :minimo, :negocios, :volume_financeiro)
-                        ON CONFLICT (id_ativo, data) 
-                        DO UPDATE SET 
-                            preco_abertura = EXCLUDED.preco_abertura,
-                            preco_fechamento = EXCLUDED.preco_fechamento,
-                            maximo = EXCLUDED.maximo,
-                            minimo = EXCLUDED.minimo,
-                            negocios = EXCLUDED.negocios,
-                            volume_financeiro = EXCLUDED.volume_financeiro
-                    """), insert_data)
-                    
-                    total_inserted += len(insert_data)
-                    logger.info(f"Inserido lote {i//batch_size + 1}: {len(insert_data)} cotacoes")
-                
-                conn.commit()
+            # A sequencia do id passa para a nova tabela (senao seria apagada com a antiga)
+            cursor.execute("SELECT pg_get_serial_sequence('cotacoes_plana', 'id')")
+            sequencia = cursor.fetchone()[0]
+            cursor.execute(COTACOES_PARTICIONADA_DDL.format(sequencia=sequencia))
+            cursor.execute(f"ALTER SEQUENCE {sequencia} OWNED BY cotacoes.id")
             
-            logger.info(f"Inseridas {total_inserted} cotacoes para {data_str}")
-            return True
+            cursor.execute("SELECT MIN(data), MAX(data), COUNT(*) FROM cotacoes_plana")
+            data_min, data_max, total = cursor.fetchone()
+            self._particoes = set()
+            if total:
+                meses = pd.period_range(data_min, data_max, freq='M').start_time.date
+                self._criar_particoes(cursor, meses)
             
+            colunas = ', '.join(['id'] + COLUNAS_COTACOES)
+            cursor.execute(f"INSERT INTO cotacoes ({colunas}) SELECT {colunas} FROM cotacoes_plana")
+            if cursor.rowcount != total:
+                raise ValueError(f"Migracao copiou {cursor.rowcount} de {total} cotacoes")
+            
+            if not manter_antiga:
+                cursor.execute("DROP TABLE cotacoes_plana")
+            cursor.execute("ANALYZE cotacoes")
+            
+            conexao.commit()
+            cursor.close()
+            self._particionada = True
+            logger.info(f"cotacoes migrada para particionada por mes: {total} linhas em "
+                        f"{len(self._particoes)} particoes ({time.perf_counter() - inicio:.1f} s)")
+            return True
         except Exception as e:
-            logger.error(f"Erro ao inserir cotacoes: {e}")
+            conexao.rollback()
+            self._particoes = set()
+            logger.error(f"Erro ao migrar cotacoes para particionada: {e}")
             return False
+        finally:
+            conexao.close()
     
-    def execute_query(self, query, params=None):
-        """Executa uma query personalizada"""
+    def _copy_cotacoes(self, cursor, df_cotacoes):
+        """Carga em massa: COPY para a tabela de staging (unlogged) e um unico INSERT em cotacoes"""
+        colunas = ', '.join(COLUNAS_COTACOES)
+        lote = CARGA_CONFIG.get('copy_lote', 200000)
+        
+        # cotacoes_staging vem das migracoes; TRUNCATE bloqueia a staging ate o commit: uma carga por vez
+        cursor.execute("TRUNCATE cotacoes_staging")
+        
+        # CSV gerado em lotes: o frame inteiro nunca vira texto de uma vez
+        for i in range(0, len(df_cotacoes), lote):
+            self._copy_frame(cursor, 'cotacoes_staging', df_cotacoes[COLUNAS_COTACOES].iloc[i:i + lote])
+        
+        cursor.execute(f"INSERT INTO cotacoes ({colunas}) SELECT {colunas} FROM cotacoes_staging")
+        inseridas = cursor.rowcount
+        cursor.execute("TRUNCATE cotacoes_staging")
+        return inseridas
+    
+    def _insert_values_cotacoes(self, cursor, df_cotacoes):
+        """Carga de frames pequenos com INSERT ... VALUES em lotes (execute_values)"""
+        from psycopg2.extras import execute_values
+        
+        # Nulos do pandas (NaN/NA/NaT) viram None; tuplas geradas sem iterrows
+        df = df_cotacoes[COLUNAS_COTACOES].astype(object)
+        linhas = list(df.where(df.notna(), None).itertuples(index=False, name=None))
+        
+        execute_values(
+            cursor,
+            f"INSERT INTO cotacoes ({', '.join(COLUNAS_COTACOES)}) VALUES %s",
+            linhas,
+            page_size=CARGA_CONFIG.get('executemany_lote', 1000)
+        )
+        return len(linhas)
+    
+    def _centavos_para_reais(self, df):
+        """Converte as colunas em centavos (inteiras) para reais na fronteira com o banco"""
+        colunas = [coluna for coluna in B3_CONFIG['colunas_centavos']
+                   if coluna in df.columns and pd.api.types.is_integer_dtype(df[coluna])]
+        if not colunas:
+            return df
+        return df.assign(**{coluna: df[coluna] / 100 for coluna in colunas})
+    
+    def execute_query(self, query, params=None, tipado=False):
+        """Executa uma query personalizada (marcadores %s)
+
+        tipado=True materializa o resultado com COPY, ja nos tipos de TIPOS_COLUNAS
+        (consultas grandes de historico); senao usa pd.read_sql.
+        Erros sao registrados e levantados: a query nunca e reexecutada com outros parametros.
+        """
+        params = tuple(params) if isinstance(params, list) else (params or None)
         try:
-            if params and len(params) > 0:
-                # Converter lista para dicionário se necessário
-                if isinstance(params, list):
-                    # Para queries com %s, usar lista diretamente
-                    df = pd.read_sql(query, self.engine, params=params)
-                else:
-                    # Para queries com :param, usar dicionário
-                    df = pd.read_sql(query, self.engine, params=params)
+            self._conferir_parametros(query, params)
+            if tipado:
+                df = self.fetch_tipado(query, params)
             else:
-                # Se não há parâmetros, usar sem params
-                df = pd.read_sql(query, self.engine)
+                df = pd.read_sql(query, self.engine, params=params)
             logger.info(f"Query executada com sucesso. Retornadas {len(df)} linhas")
             return df
         except Exception as e:
             logger.error(f"Erro ao executar query: {e}")
             logger.error(f"Query: {query}")
             logger.error(f"Params: {params}")
-            # Tentar execução alternativa sem parâmetros se falhar
-            try:
-                if params:
-                    logger.warning("Tentando execução sem parâmetros...")
-                    df = pd.read_sql(query.replace('%s', "''"), self.engine)
-                    logger.info(f"Query alternativa executada. Retornadas {len(df)} linhas")
-                    return df
-            except:
-                pass
-            return pd.DataFrame()
+            raise
+    
+    def execute_prepared(self, nome, params=None):
+        """Executa pelo nome uma consulta do registro (PREPARE uma vez por conexao; tipos de TIPOS_COLUNAS)"""
+        try:
+            linhas, colunas = self.preparadas.executar(nome, params)
+            df = self._aplicar_tipos(pd.DataFrame.from_records(linhas, columns=colunas, coerce_float=True))
+            logger.info(f"Consulta {nome} executada com sucesso. Retornadas {len(df)} linhas")
+            return df
+        except Exception as e:
+            logger.error(f"Erro ao executar consulta {nome}: {e}")
+            logger.error(f"Params: {params}")
+            raise
+    
+    def execute_tipado(self, nome, params=None):
+        """Executa pelo nome uma consulta grande do registro pelo caminho tipado (COPY)
+
+        Para resultados grandes (historico, dividendos): sem fetchall nem tuplas por linha.
+        A latencia entra nas mesmas metricas das consultas preparadas.
+        """
+        inicio = time.perf_counter()
+        df = self.execute_query(sql(nome), params, tipado=True)
+        registrar(nome, time.perf_counter() - inicio)
+        return df
+    
+    def _conferir_parametros(self, query, params):
+        """Falha antes de ir ao banco se os parametros nao batem com os marcadores %s"""
+        esperados = query.count('%s')
+        recebidos = len(params) if isinstance(params, tuple) else (0 if params is None else None)
+        if recebidos is not None and recebidos != esperados:
+            raise ValueError(f"Query com {esperados} marcadores %s recebeu {recebidos} parametros")
+    
+    def fetch_tipado(self, query, params=None, tipos=None):
+        """Resultado da query via COPY (query) TO STDOUT em CSV, lido direto em colunas tipadas
+
+        Sem tuplas Python por linha nem inferencia de tipos do read_sql.
+        tipos: coluna -> dtype, somado a TIPOS_COLUNAS (colunas datetime64 sao convertidas com formato fixo).
+        """
+        from psycopg2.extensions import encodings
+        tipos = {**TIPOS_COLUNAS, **(tipos or {})}
+        buffer = BytesIO()
+        
+        conexao = self.engine.raw_connection()
+        try:
+            cursor = conexao.cursor()
+            codificacao = encodings[conexao.encoding]
+            # COPY nao aceita parametros: o psycopg2 faz o binding (com escape) no texto da query
+            consulta = cursor.mogrify(query.strip().rstrip(';'), params).decode(codificacao)
+            cursor.copy_expert(f"COPY ({consulta}) TO STDOUT WITH (FORMAT csv, HEADER true)", buffer)
+            conexao.rollback()
+            cursor.close()
+        finally:
+            conexao.close()
+        
+        buffer.seek(0)
+        return ler_csv_tipado(buffer, tipos, codificacao)
+    
+    def iter_query(self, query, params=None, chunk_rows=None, como_array=False):
+        """Percorre o resultado em lotes de chunk_rows linhas com um cursor nomeado (do servidor)
+
+        A memoria fica limitada a um lote, qualquer que seja o tamanho do resultado.
+        Cada lote vem como DataFrame com os tipos de TIPOS_COLUNAS, ou, com como_array=True,
+        como dicionario coluna -> array NumPy.
+        """
+        chunk_rows = chunk_rows or CONSULTA_CONFIG.get('lote_iteracao', 50000)
+        params = tuple(params) if isinstance(params, list) else (params or None)
+        self._conferir_parametros(query, params)
+        
+        conexao = self.engine.raw_connection()
+        try:
+            # Cursor com nome: o resultado fica no servidor e vem em lotes de itersize linhas
+            cursor = conexao.cursor(name=f"iter_query_{uuid.uuid4().hex}")
+            cursor.itersize = chunk_rows
+            cursor.execute(query, params)
+            
+            total = 0
+            while True:
+                linhas = cursor.fetchmany(chunk_rows)
+                if not linhas:
+                    break
+                colunas = [descricao[0] for descricao in cursor.description]
+                df = self._aplicar_tipos(pd.DataFrame.from_records(linhas, columns=colunas, coerce_float=True))
+                total += len(df)
+                yield {coluna: df[coluna].to_numpy() for coluna in df.columns} if como_array else df
+            
+            cursor.close()
+            logger.info(f"Query percorrida em lotes. Retornadas {total} linhas")
+        finally:
+            # Fecha o portal mesmo se o consumidor parar antes do fim
+            conexao.rollback()
+            conexao.close()
+    
+    def _aplicar_tipos(self, df):
+        """Converte as colunas conhecidas para os tipos de TIPOS_COLUNAS"""
+        for coluna in df.columns:
+            tipo = TIPOS_COLUNAS.get(coluna)
+            if tipo is None or tipo == 'str':
+                continue
+            if pd.api.types.is_datetime64_any_dtype(tipo):
+                df[coluna] = pd.to_datetime(df[coluna])
+            else:
+                df[coluna] = df[coluna].astype(tipo)
+        return df
     
     def insert_dividendos(self, df_dividendos, ativos_db):
         """Insere dividendos no banco"""
@@ -256,39 +653,44 @@ class DatabaseManager:
                 logger.warning("Nenhum dividendo para inserir")
                 return True
             
-            # Fazer merge com ativos do banco para obter IDs
-            df_dividendos['codigo'] = df_dividendos['codigo'].astype(str)
-            ativos_db['codigo'] = ativos_db['codigo'].astype(str)
-            
-            df_merged = df_dividendos.merge(ativos_db, how='left', on='codigo')
+            # IDs resolvidos pelo mapa de ativos (busca por codigo distinto, sem merge)
+            mapa = ativos_db if isinstance(ativos_db, MapaAtivos) else MapaAtivos(ativos_db)
+            df_merged = df_dividendos.assign(id=mapa.resolver(df_dividendos['codigo']))
             df_merged = df_merged.dropna(subset=['id'])  # Remover ativos não encontrados
             
             if df_merged.empty:
                 logger.warning("Nenhum dividendo com ativo válido encontrado")
                 return True
             
-            # Preparar dados para inserção
-            insert_data = []
-            for _, row in df_merged.iterrows():
-                insert_data.append({
-                    'id_ativo': int(row['id']),
-                    'data': row['data'],
-                    'valor': float(row['valor']),
-                    'tipo': row['tipo']
-                })
-            
-            # Inserir com UPSERT (evita duplicatas)
-            from sqlalchemy import text
-            with self.engine.connect() as conn:
-                conn.execute(text("""
+            # Preparar dados para inserção (chave repetida no lote: vale a ultima linha)
+            df_merged = df_merged.drop_duplicates(subset=['id', 'data'], keep='last')
+            insert_data = [
+                (int(row['id']), row['data'], float(row['valor']), row['tipo'])
+                for _, row in df_merged.iterrows()
+            ]
+            
+            # Inserir com UPSERT (evita duplicatas); xmax = 0 marca as linhas realmente inseridas
+            from psycopg2.extras import execute_values
+            conexao = self.engine.raw_connection()
+            try:
+                cursor = conexao.cursor()
+                inseridos = execute_values(cursor, """
                     INSERT INTO dividendos (id_ativo, data, valor, tipo)
-                    VALUES (:id_ativo, :data, :valor, :tipo)
+                    VALUES %s
                     ON CONFLICT (id_ativo, data) 
                     DO UPDATE SET 
                         valor = EXCLUDED.valor,
                         tipo = EXCLUDED.tipo
-                """), insert_data)
-                conn.commit()
+                    RETURNING (xmax = 0)
+                """, insert_data, page_size=CARGA_CONFIG.get('executemany_lote', 1000), fetch=True)
+                self._somar_contador(cursor, 'dividendos', sum(1 for (inserido,) in inseridos if inserido))
+                conexao.commit()
+                cursor.close()
+            except Exception:
+                conexao.rollback()
+                raise
+            finally:
+                conexao.close()
             
             logger.info(f"Inseridos/atualizados {len(insert_data)} dividendos")
             return True
@@ -297,99 +699,109 @@ class DatabaseManager:
             logger.error(f"Erro ao inserir dividendos: {e}")
             return False
 
-    def get_table_count(self, table_name):
-        """Retorna o numero de registros de uma tabela"""
+    def get_table_count(self, table_name, modo=None):
+        """Retorna o numero de registros de uma tabela (contador ou estimativa, sem COUNT(*))"""
         try:
-            result = pd.read_sql(f"SELECT COUNT(*) as count FROM {table_name}", self.engine)
-            return result['count'][0]
+            modo = modo or ESTATISTICAS_CONFIG.get('modo', 'exato')
+            if table_name not in TABELAS_ESTATISTICAS:
+                raise ValueError(f"Tabela sem estatisticas: {table_name}")
+            
+            from sqlalchemy import text
+            with self.engine.connect() as conn:
+                if modo == 'estimado':
+                    # Soma das particoes folha (tabela simples: ela mesma)
+                    query = """
+                        SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)::bigint
+                        FROM pg_partition_tree(CAST(:tabela AS regclass)) p
+                        JOIN pg_class c ON c.oid = p.relid
+                        WHERE p.isleaf
+                    """
+                elif table_name == 'cotacoes':
+                    query = "SELECT COALESCE(SUM(registros), 0) FROM cotacoes_pregoes"
+                else:
+                    query = "SELECT COALESCE(MAX(registros), 0) FROM estatisticas_tabelas WHERE tabela = :tabela"
+                params = {'tabela': table_name} if ':tabela' in query else {}
+                return int(conn.execute(text(query), params).scalar())
         except Exception as e:
             logger.error(f"Erro ao contar registros da tabela {table_name}: {e}")
             return 0
     
+    def get_estatisticas(self, modo=None):
+        """Estatisticas das tabelas so com catalogo e agregados mantidos pela ingestao
+
+        modo 'exato' le os contadores (estatisticas_tabelas, cotacoes_pregoes);
+        'estimado' usa pg_class.reltuples (ultimo ANALYZE/autovacuum).
+        Retorna {'modo', 'tabelas' (registros e tamanhos por tabela), 'data_min', 'data_max', 'por_ano'}.
+        """
+        modo = modo or ESTATISTICAS_CONFIG.get('modo', 'exato')
+        if modo not in ('exato', 'estimado'):
+            raise ValueError(f"Modo de estatisticas invalido: {modo} (use 'exato' ou 'estimado')")
+        
+        conexao = self.engine.raw_connection()
+        try:
+            cursor = conexao.cursor()
+            linhas = []
+            for tabela in TABELAS_ESTATISTICAS:
+                # pg_partition_tree cobre tabela simples e particionada (soma das particoes folha)
+                cursor.execute("""
+                    SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)::bigint,
+                           COALESCE(SUM(pg_table_size(p.relid)), 0),
+                           COALESCE(SUM(pg_indexes_size(p.relid)), 0)
+                    FROM pg_partition_tree(%s::regclass) p
+                    JOIN pg_class c ON c.oid = p.relid
+                    WHERE p.isleaf
+                """, (tabela,))
+                estimados, tamanho_tabela, tamanho_indices = cursor.fetchone()
+                linhas.append((tabela, estimados, tamanho_tabela, tamanho_indices))
+            tabelas = pd.DataFrame(linhas, columns=['tabela', 'registros', 'tamanho_tabela',
+                                                    'tamanho_indices']).set_index('tabela')
+            
+            # Pregoes: ~250 linhas por ano, nunca a tabela cotacoes
+            cursor.execute("""
+                SELECT EXTRACT(YEAR FROM data)::int AS ano, SUM(registros)::bigint AS registros,
+                       MIN(data) AS data_min, MAX(data) AS data_max
+                FROM cotacoes_pregoes
+                GROUP BY 1
+                ORDER BY 1
+            """)
+            por_ano = pd.DataFrame(cursor.fetchall(), columns=['ano', 'registros', 'data_min', 'data_max'])
+            
+            if modo == 'exato':
+                cursor.execute("SELECT tabela, registros FROM estatisticas_tabelas")
+                contadores = dict(cursor.fetchall())
+                contadores['cotacoes'] = int(por_ano['registros'].sum())
+                tabelas['registros'] = [int(contadores.get(tabela, 0)) for tabela in tabelas.index]
+            
+            conexao.rollback()
+            cursor.close()
+        finally:
+            conexao.close()
+        
+        return {
+            'modo': modo,
+            'tabelas': tabelas,
+            'data_min': por_ano['data_min'].min() if not por_ano.empty else None,
+            'data_max': por_ano['data_max'].max() if not por_ano.empty else None,
+            'por_ano': por_ano[['ano', 'registros']]
+        }
+    
     def check_and_create_tables(self):
-        """Verifica se as tabelas existem e cria se necessário"""
+        """Confere a versao do schema e aplica as migracoes pendentes"""
         try:
-            # Verificar se as tabelas existem
-            tables_query = """
-            SELECT table_name 
-            FROM information_schema.tables 
-            WHERE table_schema = 'public'
-            """
-            existing_tables = pd.read_sql(tables_query, self.engine)['table_name'].tolist()
-            
-            required_tables = ['ativos', 'cotacoes', 'dividendos']
-            missing_tables = [table for table in required_tables if table not in existing_tables]
-            
-            if missing_tables:
-                logger.info(f"Tabelas faltando: {missing_tables}")
-                logger.info("Criando tabelas...")
-                
-                # Executar schema.sql
-                import os
-                schema_path = os.path.join(os.path.dirname(__file__), 'schema.sql')
-                if os.path.exists(schema_path):
-                    with open(schema_path, 'r') as f:
-                        schema_sql = f.read()
-                    
-                    from sqlalchemy import text
-                    with self.engine.connect() as conn:
-                        conn.execute(text(schema_sql))
-                        conn.commit()
-                    
-                    logger.info("Tabelas criadas com sucesso")
-                else:
-                    logger.error("Arquivo schema.sql não encontrado")
-                    return False
-            else:
-                logger.info("Todas as tabelas já existem")
+            if not self.migracoes.aplicar_pendentes():
+                return False
             
-            # Verificar e corrigir constraints da tabela dividendos
-            self._fix_dividendos_constraint()
+            # Layout particionado: tabela vazia e migrada na hora; com dados, so pelo comando
+            if PARTICIONAMENTO_CONFIG.get('cotacoes_por_mes') and not self.cotacoes_particionada():
+                from sqlalchemy import text
+                with self.engine.connect() as conn:
+                    vazia = not conn.execute(text("SELECT EXISTS (SELECT 1 FROM cotacoes)")).scalar()
+                if vazia:
+                    return self.migrar_cotacoes_particionada()
+                logger.warning("cotacoes ainda nao e particionada. Migre com: python main.py --particionar-cotacoes")
             
             return True
             
         except Exception as e:
             logger.error(f"Erro ao verificar/criar tabelas: {e}")
             return False
-    
-    def _fix_dividendos_constraint(self):
-        """Corrige constraint da tabela dividendos se necessário"""
-        try:
-            from sqlalchemy import text
-            with self.engine.connect() as conn:
-                # Verificar se a constraint existe
-                check_constraint = """
-                SELECT constraint_name 
-                FROM information_schema.table_constraints 
-                WHERE table_name = 'dividendos' 
-                AND constraint_type = 'UNIQUE'
-                AND constraint_name LIKE '%id_ativo%data%'
-                """
-                result = conn.execute(text(check_constraint))
-                constraints = result.fetchall()
-                
-                if not constraints:
-                    logger.info("Adicionando constraint única para dividendos...")
-                    # Primeiro remover duplicatas se existirem
-                    remove_duplicates = """
-                    DELETE FROM dividendos a USING dividendos b 
-                    WHERE a.id > b.id 
-                    AND a.id_ativo = b.id_ativo 
-                    AND a.data = b.data
-                    """
-                    conn.execute(text(remove_duplicates))
-                    
-                    # Adicionar constraint
-                    add_constraint = """
-                    ALTER TABLE dividendos 
-                    ADD CONSTRAINT dividendos_id_ativo_data_unique 
-                    UNIQUE (id_ativo, data)
-                    """
-                    conn.execute(text(add_constraint))
-                    conn.commit()
-                    logger.info("Constraint de dividendos corrigida")
-                else:
-                    logger.info("Constraint de dividendos já existe")
-                    
-        except Exception as e:
-            logger.warning(f"Não foi possível corrigir constraint de dividendos: {e}")
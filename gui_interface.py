@@ -754,27 +754,24 @@ class FilterDialog:
         """Carrega setores disponíveis baseado no tipo selecionado"""
         try:
             from database_manager import DatabaseManager
-            import pandas as pd
             db = DatabaseManager()
             
-            # Primeiro verificar se há dados na tabela
-            count_query = "SELECT COUNT(*) as total FROM ativos"
-            count_df = pd.read_sql(count_query, db.engine)
-            total_ativos = count_df.iloc[0]['total']
+            # Primeiro verificar se há dados na tabela (para no primeiro registro)
+            from sqlalchemy import text
+            with db.engine.connect() as conn:
+                tem_ativos = conn.execute(text("SELECT EXISTS (SELECT 1 FROM ativos)")).scalar()
             
-            if total_ativos == 0:
+            if not tem_ativos:
                 self.setor_combo['values'] = [""]
                 self.info_label.config(text="Nenhum ativo encontrado no banco. Execute a coleta de dados primeiro.")
                 self.setor_combo.set("")
                 return
             
-            # Query para buscar setores
+            # Consultas preparadas de setores (com e sem filtro de tipo)
             if tipo_filtro:
-                query = "SELECT DISTINCT setor FROM ativos WHERE tipo = %s AND setor IS NOT NULL AND setor != '' ORDER BY setor"
-                df = pd.read_sql(query, db.engine, params=(tipo_filtro,))
+                df = db.execute_prepared('setores_tipo', (tipo_filtro,))
             else:
-                query = "SELECT DISTINCT setor FROM ativos WHERE setor IS NOT NULL AND setor != '' ORDER BY setor"
-                df = pd.read_sql(query, db.engine)
+                df = db.execute_prepared('setores')
             
             # Atualizar combo de setores
             if not df.empty:
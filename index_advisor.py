@@ -0,0 +1,115 @@
+# ====================================
+# MODULO: ADVISOR DE INDICES DOS RELATORIOS
+# ====================================
+
+import json
+import logging
+import os
+import re
+from config import engine, ADVISOR_CONFIG
+from consultas_relatorios import CONSULTAS
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Perfil de indices para as consultas dos relatorios (criado pela migracao 0007)
+PERFIL_INDICES = {
+    'cotacoes_ativo_data_desc_idx': 'cotacoes',  # (id_ativo, data DESC) INCLUDE (preco_fechamento)
+    'cotacoes_data_brin': 'cotacoes',  # BRIN em data (intervalos de datas)
+    'dividendos_data_idx': 'dividendos'
+}
+
+
+def consultas_arquivo(caminho):
+    """Consultas SELECT de um arquivo .sql (nome = comentario de titulo mais proximo)"""
+    with open(caminho, 'r', encoding='utf-8') as arquivo:
+        conteudo = arquivo.read()
+
+    consultas = []
+    for numero, bloco in enumerate(conteudo.split(';'), start=1):
+        titulos = re.findall(r'^--\s*(\d+\..*)$', bloco, flags=re.MULTILINE)
+        sql = '\n'.join(linha for linha in bloco.splitlines() if not linha.strip().startswith('--')).strip()
+        if sql.upper().startswith('SELECT'):
+            nome = titulos[-1].strip() if titulos else f"consulta {numero}"
+            consultas.append((f"{os.path.basename(caminho)}: {nome}", sql, None))
+    return consultas
+
+
+def seq_scans(plano, limiar):
+    """Nos Seq Scan do plano com estimativa de linhas acima do limiar"""
+    encontrados = []
+    if 'Seq Scan' in plano.get('Node Type', '') and plano.get('Plan Rows', 0) >= limiar:
+        encontrados.append((plano.get('Relation Name'), int(plano['Plan Rows'])))
+    for filho in plano.get('Plans', []):
+        encontrados.extend(seq_scans(filho, limiar))
+    return encontrados
+
+
+class IndexAdvisor:
+    """Roda EXPLAIN nas consultas registradas e aponta Seq Scans grandes"""
+
+    def __init__(self, limiar_linhas=None):
+        self.engine = engine
+        self.limiar_linhas = limiar_linhas or ADVISOR_CONFIG.get('limiar_linhas', 10000)
+
+    def consultas(self):
+        """Consultas dos relatorios (registro) e do arquivo do Power BI"""
+        consultas = [(nome, item['sql'], item['exemplo']()) for nome, item in CONSULTAS.items()]
+        for caminho in ADVISOR_CONFIG.get('arquivos_sql', []):
+            if os.path.exists(caminho):
+                consultas.extend(consultas_arquivo(caminho))
+        return consultas
+
+    def indices_ausentes(self, cursor):
+        """Indices do perfil que ainda nao existem no banco"""
+        cursor.execute("SELECT indexname FROM pg_indexes WHERE schemaname = 'public'")
+        existentes = {linha[0] for linha in cursor.fetchall()}
+        return [nome for nome in PERFIL_INDICES if nome not in existentes]
+
+    def analisar(self):
+        """Retorna [(consulta, [(tabela, linhas estimadas)], erro)] para cada consulta"""
+        resultados = []
+        conexao = self.engine.raw_connection()
+        try:
+            cursor = conexao.cursor()
+            for nome, sql, params in self.consultas():
+                try:
+                    cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+                    plano = cursor.fetchone()[0]
+                    if isinstance(plano, str):
+                        plano = json.loads(plano)
+                    resultados.append((nome, seq_scans(plano[0]['Plan'], self.limiar_linhas), None))
+                except Exception as e:
+                    # Ex.: tabela carteira inexistente; segue para a proxima consulta
+                    resultados.append((nome, [], str(e).strip().splitlines()[0]))
+                conexao.rollback()
+            self.ausentes = self.indices_ausentes(cursor)
+            cursor.close()
+        finally:
+            conexao.close()
+        return resultados
+
+    def imprimir_relatorio(self):
+        """Imprime o diagnostico no terminal; retorna o numero de consultas sinalizadas"""
+        resultados = self.analisar()
+        sinalizadas = 0
+
+        print(f"\nADVISOR DE INDICES (Seq Scan acima de {self.limiar_linhas} linhas estimadas)")
+        print("=" * 60)
+        for nome, scans, erro in resultados:
+            if erro:
+                print(f"[ERRO] {nome}: {erro}")
+            elif scans:
+                sinalizadas += 1
+                detalhes = ', '.join(f"{tabela} (~{linhas} linhas)" for tabela, linhas in scans)
+                print(f"[SEQ SCAN] {nome}: {detalhes}")
+            else:
+                print(f"[OK] {nome}")
+
+        if self.ausentes:
+            print(f"\nIndices do perfil ausentes: {', '.join(self.ausentes)}")
+            print("Aplique as migracoes (qualquer workflow de ingestao as aplica na inicializacao)")
+
+        print(f"\n{sinalizadas} de {len(resultados)} consultas com Seq Scan acima do limiar")
+        return sinalizadas
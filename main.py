@@ -200,9 +200,90 @@ def main():
         action='store_true', 
         help='Executar com interface de terminal'
     )
+    parser.add_argument(
+        '--cache-info',
+        action='store_true',
+        help='Mostrar os arquivos da B3 no cache local e sair'
+    )
+    parser.add_argument(
+        '--cache-limpar',
+        action='store_true',
+        help='Remover todos os arquivos do cache local e sair'
+    )
+    parser.add_argument(
+        '--particionar-cotacoes',
+        action='store_true',
+        help='Migrar a tabela cotacoes para o layout particionado por mês e sair'
+    )
+    parser.add_argument(
+        '--advise',
+        action='store_true',
+        help='Rodar EXPLAIN nas consultas dos relatórios, apontar Seq Scans grandes e sair'
+    )
+    parser.add_argument(
+        '--exportar-cotacoes',
+        nargs='+',
+        metavar='ARG',
+        help='Exportar cotações para CSV: ARQUIVO [INICIO [FIM]] (AAAA ou AAAA-MM-DD) e sair'
+    )
+    parser.add_argument(
+        '--backfill',
+        nargs='+',
+        metavar='DATA',
+        help='Carga histórica: INICIO [FIM] (AAAA ou AAAA-MM-DD) e sair'
+    )
+    parser.add_argument(
+        '--backfill-workers',
+        type=int,
+        help='Número de anos processados em paralelo no backfill'
+    )
     
     args = parser.parse_args()
     
+    # Comandos do cache local (não abrem interface)
+    if args.cache_info or args.cache_limpar:
+        from cache_manager import CacheManager
+        from parquet_cache import ParquetCache
+        cache = CacheManager()
+        parquet = ParquetCache()
+        if args.cache_limpar:
+            cache.limpar()
+            parquet.limpar()
+        cache.imprimir_resumo()
+        parquet.imprimir_resumo()
+        return
+    
+    # Migração de cotacoes para particionada por mês (não abre interface)
+    if args.particionar_cotacoes:
+        from database_manager import DatabaseManager
+        sys.exit(0 if DatabaseManager().migrar_cotacoes_particionada() else 1)
+    
+    # Advisor de índices das consultas dos relatórios (não abre interface)
+    if args.advise:
+        from index_advisor import IndexAdvisor
+        IndexAdvisor().imprimir_relatorio()
+        return
+    
+    # Exportação do histórico de cotações em lotes (não abre interface)
+    if args.exportar_cotacoes:
+        from backfill_workflow import interpretar_data
+        from reports_manager import ReportsManager
+        datas = args.exportar_cotacoes[1:]
+        data_inicio = interpretar_data(datas[0]) if datas else None
+        data_fim = interpretar_data(datas[1], fim_do_ano=True) if len(datas) > 1 else None
+        sys.exit(0 if ReportsManager().exportar_cotacoes(args.exportar_cotacoes[0], data_inicio, data_fim) is not None else 1)
+    
+    # Carga histórica de vários anos (não abre interface)
+    if args.backfill:
+        from backfill_workflow import BackfillWorkflow, interpretar_data
+        from config import calcular_d1
+        data_inicio = interpretar_data(args.backfill[0])
+        data_fim = interpretar_data(args.backfill[1], fim_do_ano=True) if len(args.backfill) > 1 else None
+        if data_fim:
+            data_fim = min(data_fim, calcular_d1())
+        sucesso = BackfillWorkflow(workers=args.backfill_workers).execute(data_inicio, data_fim)
+        sys.exit(0 if sucesso else 1)
+    
     # Se nenhuma opção for especificada, usar GUI por padrão
     if not args.gui and not args.terminal:
         args.gui = True  # Interface gráfica como padrão
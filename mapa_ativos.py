@@ -0,0 +1,80 @@
+# ====================================
+# MODULO: MAPA CODIGO -> ID DOS ATIVOS
+# ====================================
+
+import logging
+import numpy as np
+import pandas as pd
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class MapaAtivos:
+    """Mapa codigo -> id dos ativos em memoria, versionado e compartilhado entre as etapas da ingestao"""
+
+    def __init__(self, df_ativos=None):
+        self.versao = 0
+        self.carregado = False
+        self.ids = pd.Series(dtype='int64')
+        if df_ativos is not None:
+            self.carregar(df_ativos)
+
+    def carregar(self, df_ativos):
+        """Substitui o mapa pelo conteudo de um frame (colunas id, codigo) com todos os ativos"""
+        self.ids = self._serie(df_ativos)
+        self.carregado = True
+        self.versao += 1
+        logger.info(f"Mapa de ativos carregado: {len(self.ids)} codigos (versao {self.versao})")
+
+    def atualizar(self, df_ativos):
+        """Inclui/atualiza os codigos do frame; a versao so muda se algum id mudar"""
+        novos = self._serie(df_ativos)
+        atuais = self.ids.reindex(novos.index)
+        if novos.empty or atuais.eq(novos).all():
+            return False
+
+        self.ids = pd.concat([self.ids[~self.ids.index.isin(novos.index)], novos])
+        self.versao += 1
+        logger.info(f"Mapa de ativos atualizado: {len(self.ids)} codigos (versao {self.versao})")
+        return True
+
+    def invalidar(self):
+        """Descarta o mapa (ex.: ativos removidos); o proximo uso recarrega do banco"""
+        self.ids = pd.Series(dtype='int64')
+        self.carregado = False
+        self.versao += 1
+
+    def faltantes(self, codigos):
+        """Codigos distintos ainda fora do mapa"""
+        codigos = pd.Series(codigos)
+        if isinstance(codigos.dtype, pd.CategoricalDtype):
+            distintos = pd.Index(codigos.cat.categories).astype(str)
+        else:
+            distintos = pd.Index(pd.unique(codigos.dropna())).astype(str)
+        return distintos[~distintos.isin(self.ids.index)].tolist()
+
+    def contem(self, codigos):
+        """Mascara dos codigos presentes no mapa"""
+        return np.asarray(pd.Series(codigos).astype(str).isin(self.ids.index))
+
+    def resolver(self, codigos):
+        """ids dos codigos (float, NaN se ausente), resolvidos uma vez por codigo distinto"""
+        codigos = pd.Series(codigos)
+        if not isinstance(codigos.dtype, pd.CategoricalDtype):
+            codigos = codigos.astype('category')
+
+        ids = self.ids.reindex(codigos.cat.categories.astype(str)).to_numpy(dtype=float)
+        # Codigo -1 (nulo) aponta para o NaN acrescentado no fim
+        return np.append(ids, np.nan)[codigos.cat.codes.to_numpy()]
+
+    @staticmethod
+    def _serie(df_ativos):
+        """Serie id indexada por codigo (primeira ocorrencia de cada codigo)"""
+        ids = pd.Series(df_ativos['id'].to_numpy(dtype='int64'),
+                        index=df_ativos['codigo'].astype(str).to_numpy())
+        return ids[~ids.index.duplicated()]
+
+    def __len__(self):
+        return len(self.ids)
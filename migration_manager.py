@@ -0,0 +1,104 @@
+# ====================================
+# MODULO: MIGRACOES VERSIONADAS DO SCHEMA
+# ====================================
+
+import logging
+import os
+import re
+import time
+from config import engine, MIGRACOES_CONFIG
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Versao ja conferida neste processo: as proximas verificacoes nao vao ao banco
+_versao_conferida = None
+
+
+class MigrationManager:
+    """Aplica, uma unica vez e em ordem, os scripts NNNN_nome.sql do diretorio de migracoes"""
+
+    def __init__(self, diretorio=None):
+        self.engine = engine
+        self.diretorio = diretorio or MIGRACOES_CONFIG['diretorio']
+
+    def migracoes(self):
+        """Lista ordenada de (versao, nome, caminho) dos scripts de migracao"""
+        encontradas = []
+        for arquivo in os.listdir(self.diretorio):
+            correspondencia = re.match(r'^(\d+)_(.+)\.sql$', arquivo)
+            if correspondencia:
+                encontradas.append((int(correspondencia.group(1)), correspondencia.group(2),
+                                    os.path.join(self.diretorio, arquivo)))
+        return sorted(encontradas)
+
+    def versao_atual(self):
+        """Ultima versao aplicada no banco (0 se schema_version nao existe)"""
+        from sqlalchemy import text
+        with self.engine.connect() as conn:
+            if conn.execute(text("SELECT to_regclass('public.schema_version')")).scalar() is None:
+                return 0
+            return conn.execute(text("SELECT COALESCE(MAX(versao), 0) FROM schema_version")).scalar()
+
+    def aplicar_pendentes(self):
+        """Confere a versao do schema e aplica as migracoes que faltam"""
+        global _versao_conferida
+        try:
+            migracoes = self.migracoes()
+            ultima = migracoes[-1][0] if migracoes else 0
+            if _versao_conferida == ultima:
+                return True
+
+            atual = self.versao_atual()
+            pendentes = [migracao for migracao in migracoes if migracao[0] > atual]
+            if not pendentes:
+                logger.info(f"Schema na versao {atual}")
+                _versao_conferida = ultima
+                return True
+
+            logger.info(f"Schema na versao {atual}. Aplicando {len(pendentes)} migracoes...")
+            for versao, nome, caminho in pendentes:
+                self._aplicar(versao, nome, caminho)
+
+            _versao_conferida = ultima
+            logger.info(f"Schema atualizado para a versao {ultima}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Erro ao aplicar migracoes: {e}")
+            return False
+
+    def _aplicar(self, versao, nome, caminho):
+        """Aplica uma migracao e registra a versao na mesma transacao"""
+        with open(caminho, 'r', encoding='utf-8') as arquivo:
+            script = arquivo.read()
+
+        conexao = self.engine.raw_connection()
+        try:
+            cursor = conexao.cursor()
+            # Dois processos iniciando juntos: o segundo espera e ve a versao ja aplicada
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext('schema_version'))")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    versao int PRIMARY KEY,
+                    nome varchar(120) NOT NULL,
+                    aplicada_em timestamptz NOT NULL DEFAULT now()
+                )
+            """)
+            cursor.execute("SELECT 1 FROM schema_version WHERE versao = %s", (versao,))
+            if cursor.fetchone():
+                conexao.rollback()
+                return
+
+            inicio = time.perf_counter()
+            cursor.execute(script)
+            cursor.execute("INSERT INTO schema_version (versao, nome) VALUES (%s, %s)", (versao, nome))
+            conexao.commit()
+            cursor.close()
+            logger.info(f"Migracao {versao:04d} ({nome}) aplicada em {time.perf_counter() - inicio:.2f} s")
+        except Exception:
+            conexao.rollback()
+            raise
+        finally:
+            conexao.close()
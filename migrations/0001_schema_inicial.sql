@@ -0,0 +1,30 @@
+-- Tabelas base (bancos criados pelo schema.sql ja as possuem)
+create table if not exists ativos
+(
+  id serial primary key,
+  codigo varchar(12) not null unique,
+  nome varchar(120)
+);
+
+create table if not exists cotacoes
+(
+  id bigserial primary key,
+  id_ativo int not null references ativos(id),
+  data date not null,
+  preco_abertura numeric(18,4),
+  preco_fechamento numeric(18,4),
+  maximo numeric(18,4),
+  minimo numeric(18,4),
+  negocios int,
+  volume_financeiro numeric(20,2),
+  unique (id_ativo, data)
+);
+
+create table if not exists dividendos
+(
+  id bigserial primary key,
+  id_ativo int not null references ativos(id),
+  data date not null,
+  valor numeric(18,4) not null,
+  tipo varchar(20)
+);
@@ -0,0 +1,4 @@
+-- Tipo, setor e versao das regras de classificacao
+alter table ativos add column if not exists tipo varchar(20);
+alter table ativos add column if not exists setor varchar(80);
+alter table ativos add column if not exists regras_versao varchar(16);
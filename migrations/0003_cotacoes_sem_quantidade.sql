@@ -0,0 +1,2 @@
+-- Coluna quantidade das primeiras versoes (substituida por negocios)
+alter table cotacoes drop column if exists quantidade;
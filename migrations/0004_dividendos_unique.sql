@@ -0,0 +1,17 @@
+-- Um provento por ativo e data (necessario para o upsert de dividendos)
+do $$
+begin
+    if not exists (
+        select 1 from pg_constraint
+        where conrelid = 'dividendos'::regclass
+          and contype = 'u'
+          and pg_get_constraintdef(oid) = 'UNIQUE (id_ativo, data)'
+    ) then
+        delete from dividendos a using dividendos b
+        where a.id > b.id
+          and a.id_ativo = b.id_ativo
+          and a.data = b.data;
+
+        alter table dividendos add constraint dividendos_id_ativo_data_unique unique (id_ativo, data);
+    end if;
+end $$;
@@ -0,0 +1,2 @@
+-- Substituicao de pregoes (DELETE por data) e consultas por intervalo de datas
+create index if not exists cotacoes_data_idx on cotacoes (data);
@@ -0,0 +1,12 @@
+-- Staging da carga em massa (COPY) de cotacoes; sem WAL e sem indices
+create unlogged table if not exists cotacoes_staging
+(
+  id_ativo int,
+  data date,
+  preco_abertura numeric(18,4),
+  preco_fechamento numeric(18,4),
+  maximo numeric(18,4),
+  minimo numeric(18,4),
+  negocios int,
+  volume_financeiro numeric(20,2)
+);
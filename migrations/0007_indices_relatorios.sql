@@ -0,0 +1,6 @@
+-- Perfil de indices das consultas dos relatorios
+-- Ultima cotacao por ativo (DISTINCT ON ... ORDER BY id_ativo, data DESC) sem ler o heap
+create index if not exists cotacoes_ativo_data_desc_idx on cotacoes (id_ativo, data desc) include (preco_fechamento);
+-- Intervalos de datas sobre todo o historico (BRIN: poucas paginas, dados em ordem de carga)
+create index if not exists cotacoes_data_brin on cotacoes using brin (data);
+create index if not exists dividendos_data_idx on dividendos (data);
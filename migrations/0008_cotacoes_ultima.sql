@@ -0,0 +1,20 @@
+-- Ultima cotacao de cada ativo, mantida pela ingestao na mesma transacao da carga do pregao
+create table if not exists cotacoes_ultima
+(
+  id_ativo int primary key references ativos(id) on delete cascade,
+  data date not null,
+  preco_abertura numeric(18,4),
+  preco_fechamento numeric(18,4),
+  maximo numeric(18,4),
+  minimo numeric(18,4),
+  negocios int,
+  volume_financeiro numeric(20,2)
+);
+
+-- Carga inicial a partir do historico existente (uma unica ordenacao, na migracao)
+insert into cotacoes_ultima (id_ativo, data, preco_abertura, preco_fechamento, maximo, minimo, negocios, volume_financeiro)
+select distinct on (id_ativo)
+       id_ativo, data, preco_abertura, preco_fechamento, maximo, minimo, negocios, volume_financeiro
+from cotacoes
+order by id_ativo, data desc
+on conflict (id_ativo) do nothing;
@@ -0,0 +1,25 @@
+-- Contadores exatos mantidos pela ingestao (o resumo do sistema nao faz COUNT(*))
+create table if not exists estatisticas_tabelas
+(
+  tabela varchar(40) primary key,
+  registros bigint not null default 0,
+  atualizado_em timestamptz not null default now()
+);
+
+-- Linhas de cotacoes por pregao: total, datas extremas e contagem por ano sem varrer cotacoes
+create table if not exists cotacoes_pregoes
+(
+  data date primary key,
+  registros int not null
+);
+
+-- Carga inicial a partir dos dados existentes (varredura unica, na migracao)
+insert into cotacoes_pregoes (data, registros)
+select data, count(*) from cotacoes group by data
+on conflict (data) do update set registros = excluded.registros;
+
+insert into estatisticas_tabelas (tabela, registros)
+select 'ativos', count(*) from ativos
+union all
+select 'dividendos', count(*) from dividendos
+on conflict (tabela) do update set registros = excluded.registros, atualizado_em = now();
@@ -0,0 +1,176 @@
+# ====================================
+# MODULO: DATASET PARQUET DOS ANOS PROCESSADOS
+# ====================================
+
+import json
+import logging
+import os
+import shutil
+import time
+from contextlib import contextmanager
+import pandas as pd
+from cache_manager import _travar, _destravar
+from config import PARQUET_CONFIG
+
+try:
+    import pyarrow  # noqa: F401 (engine do pandas.to_parquet/read_parquet)
+except ImportError:
+    pyarrow = None
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Muda quando o formato das colunas transformadas muda (invalida o dataset inteiro)
+VERSAO_FORMATO = 2
+
+
+def parquet_disponivel():
+    """Indica se o pyarrow esta instalado"""
+    return pyarrow is not None
+
+
+def assinatura_filtro(filtro):
+    """Parte do filtro que muda o conteudo gravado (as datas sao aplicadas na leitura)"""
+    return json.dumps({
+        'tpmerc': sorted(str(valor) for valor in filtro.tpmerc or []),
+        'codbdi': sorted(str(valor) for valor in filtro.codbdi or []),
+        'tickers': sorted(str(valor).upper() for valor in filtro.tickers or []),
+        'tipreg': filtro.tipreg,
+        'versao': VERSAO_FORMATO
+    }, sort_keys=True)
+
+
+class ParquetCache:
+    """Cotacoes transformadas de cada ano do COTAHIST, particionadas por ano e mes"""
+
+    def __init__(self, diretorio=None):
+        self.diretorio = diretorio or PARQUET_CONFIG['diretorio']
+        self.caminho_indice = os.path.join(self.diretorio, 'indice.json')
+        os.makedirs(self.diretorio, exist_ok=True)
+        self.indice = self._carregar_indice()
+        self._travado = False
+
+    def _carregar_indice(self):
+        """Carrega o indice do dataset (ano -> hash do arquivo de origem)"""
+        try:
+            with open(self.caminho_indice, 'r', encoding='utf-8') as arquivo:
+                return json.load(arquivo)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Indice do dataset Parquet invalido, recriando: {e}")
+            return {}
+
+    def _salvar_indice(self):
+        """Grava o indice de forma atomica (temporario por processo)"""
+        temporario = f"{self.caminho_indice}.{os.getpid()}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(self.indice, arquivo, indent=2)
+        os.replace(temporario, self.caminho_indice)
+
+    @contextmanager
+    def _indice_travado(self):
+        """Read-modify-write do indice sob trava de arquivo: recarrega do disco e grava ao sair
+
+        Os processos do backfill gravam anos diferentes no mesmo indice; sem a trava,
+        um sobrescreveria as entradas dos outros. Reentrante na mesma instancia.
+        """
+        if self._travado:
+            yield self.indice
+            return
+
+        with open(self.caminho_indice + '.lock', 'a+b') as trava:
+            _travar(trava)
+            self._travado = True
+            try:
+                self.indice = self._carregar_indice()
+                yield self.indice
+                self._salvar_indice()
+            finally:
+                self._travado = False
+                _destravar(trava)
+
+    def _caminho_ano(self, ano):
+        """Diretorio da particao do ano"""
+        return os.path.join(self.diretorio, f"ano={ano}")
+
+    def disponivel(self, ano, sha256, filtro):
+        """Indica se o ano ja foi gravado a partir do mesmo arquivo e com o mesmo filtro"""
+        # Outro processo (ex.: backfill) pode ter gravado o indice nesse meio tempo
+        self.indice = self._carregar_indice()
+        entrada = self.indice.get(str(ano))
+        return (bool(entrada) and bool(sha256)
+                and entrada.get('sha256') == sha256
+                and entrada.get('filtro') == assinatura_filtro(filtro)
+                and os.path.isdir(self._caminho_ano(ano)))
+
+    def gravar(self, ano, sha256, filtro, df):
+        """Grava as cotacoes transformadas do ano, substituindo a versao anterior"""
+        destino = self._caminho_ano(ano)
+        temporario = f"{destino}.{os.getpid()}.tmp"
+        shutil.rmtree(temporario, ignore_errors=True)
+
+        df.assign(mes=df['data'].dt.month.astype('int8')).to_parquet(
+            temporario, engine='pyarrow', partition_cols=['mes'], index=False
+        )
+
+        # Troca a particao inteira: leitores nunca veem um ano pela metade
+        shutil.rmtree(destino, ignore_errors=True)
+        os.replace(temporario, destino)
+
+        with self._indice_travado():
+            self.indice[str(ano)] = {
+                'sha256': sha256,
+                'filtro': assinatura_filtro(filtro),
+                'registros': len(df),
+                'data_min': df['data'].min().strftime('%Y-%m-%d'),
+                'data_max': df['data'].max().strftime('%Y-%m-%d'),
+                'gravado_em': time.time()
+            }
+        logger.info(f"Dataset Parquet de {ano} gravado: {len(df)} registros")
+
+    def ler(self, ano, data_inicio=None, data_fim=None, colunas=None):
+        """Le o ano com projecao de colunas e de datas (particoes de mes fora do intervalo sao ignoradas)"""
+        filtros = []
+        if data_inicio is not None:
+            filtros.append(('mes', '>=', data_inicio.month if data_inicio.year == ano else 1))
+            filtros.append(('data', '>=', pd.Timestamp(data_inicio)))
+        if data_fim is not None:
+            filtros.append(('mes', '<=', data_fim.month if data_fim.year == ano else 12))
+            filtros.append(('data', '<=', pd.Timestamp(data_fim)))
+
+        if colunas is not None and 'data' not in colunas:
+            colunas = list(colunas) + ['data']
+
+        df = pd.read_parquet(self._caminho_ano(ano), engine='pyarrow',
+                             columns=colunas, filters=filtros or None)
+        if 'mes' in df.columns and (colunas is None or 'mes' not in colunas):
+            df = df.drop(columns='mes')
+
+        logger.info(f"Dataset Parquet de {ano}: {len(df)} registros lidos")
+        return df.sort_values('data', kind='stable').reset_index(drop=True)
+
+    def remover(self, ano):
+        """Remove o ano do dataset"""
+        with self._indice_travado():
+            shutil.rmtree(self._caminho_ano(ano), ignore_errors=True)
+            self.indice.pop(str(ano), None)
+
+    def limpar(self):
+        """Remove todos os anos do dataset"""
+        with self._indice_travado():
+            for ano in list(self.indice):
+                self.remover(ano)
+        logger.info("Dataset Parquet limpo")
+
+    def imprimir_resumo(self):
+        """Imprime os anos gravados no terminal"""
+        self.indice = self._carregar_indice()
+        print(f"\nDATASET PARQUET ({self.diretorio})")
+        print("=" * 60)
+        print(f"Anos: {len(self.indice)}")
+        for ano, entrada in sorted(self.indice.items()):
+            print(f"\n{ano}: {entrada['registros']} registros de {entrada['data_min']} a {entrada['data_max']}")
+            print(f"  sha256 do arquivo: {entrada['sha256']}")
+            print(f"  gravado em: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entrada['gravado_em']))}")
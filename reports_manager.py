@@ -4,7 +4,9 @@
 
 import pandas as pd
 import logging
+from datetime import date, timedelta
 from database_manager import DatabaseManager
+from consultas_relatorios import sql, consulta_dividendos
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -19,20 +21,15 @@ class ReportsManager:
     def consultar_ativos(self, filtro_tipo=None, filtro_setor=None):
         """Consulta lista de ativos com filtros opcionais"""
         try:
-            query = "SELECT codigo, nome, tipo, setor FROM ativos WHERE 1=1"
-            params = []
-            
-            if filtro_tipo:
-                query += " AND tipo = %s"
-                params.append(filtro_tipo)
-            
-            if filtro_setor:
-                query += " AND setor = %s"
-                params.append(filtro_setor)
-            
-            query += " ORDER BY codigo"
-            
-            df = self.db.execute_query(query, tuple(params) if params else None)
+            # Uma consulta preparada por combinacao de filtros
+            if filtro_tipo and filtro_setor:
+                df = self.db.execute_prepared('ativos_tipo_setor', (filtro_tipo, filtro_setor))
+            elif filtro_tipo:
+                df = self.db.execute_prepared('ativos_tipo', (filtro_tipo,))
+            elif filtro_setor:
+                df = self.db.execute_prepared('ativos_setor', (filtro_setor,))
+            else:
+                df = self.db.execute_prepared('ativos_todos')
             
             if not df.empty:
                 print(f"\nLISTA DE ATIVOS ({len(df)} encontrados)")
@@ -62,17 +59,9 @@ class ReportsManager:
     def historico_cotacoes(self, codigo_ativo, periodo_dias=30):
         """Gera relatorio de historico de cotacoes"""
         try:
-            query = """
-                SELECT c.data, c.preco_abertura, c.preco_fechamento, 
-                       c.maximo, c.minimo, c.volume_financeiro, a.nome
-                FROM cotacoes c
-                JOIN ativos a ON c.id_ativo = a.id
-                WHERE a.codigo = %s
-                AND c.data >= CURRENT_DATE - INTERVAL '%s days'
-                ORDER BY c.data
-            """
-            
-            df = self.db.execute_query(query, (codigo_ativo, periodo_dias))
+            # Data inicial calculada aqui: parametro do tipo date permite a poda de particoes no plano
+            data_inicio = date.today() - timedelta(days=int(periodo_dias))
+            df = self.db.execute_tipado('historico_cotacoes', (codigo_ativo, data_inicio))
             
             if df.empty:
                 print(f"ERRO: Nenhum dado encontrado para {codigo_ativo}")
@@ -103,27 +92,7 @@ class ReportsManager:
     def relatorio_dividendos(self, codigo_ativo=None, ano=None):
         """Gera relatorio de dividendos/proventos"""
         try:
-            query = """
-                SELECT a.codigo, a.nome, d.data, d.valor, d.tipo,
-                       EXTRACT(YEAR FROM d.data) as ano,
-                       EXTRACT(MONTH FROM d.data) as mes
-                FROM dividendos d
-                JOIN ativos a ON d.id_ativo = a.id
-                WHERE 1=1
-            """
-            params = []
-            
-            if codigo_ativo:
-                query += " AND a.codigo = %s"
-                params.append(codigo_ativo)
-            
-            if ano:
-                query += " AND EXTRACT(YEAR FROM d.data) = %s"
-                params.append(ano)
-            
-            query += " ORDER BY d.data DESC"
-            
-            df = self.db.execute_query(query, tuple(params) if params else None)
+            df = self.db.execute_tipado(*consulta_dividendos(codigo_ativo, ano))
             
             if df.empty:
                 print("ERRO: Nenhum dividendo encontrado")
@@ -154,25 +123,7 @@ class ReportsManager:
     def dashboard_alocacao(self):
         """Dashboard completo de alocacao da carteira"""
         try:
-            query = """
-                SELECT 
-                    a.codigo, a.nome, a.tipo, a.setor,
-                    c.qtd, c.preco_medio,
-                    c.qtd * c.preco_medio as valor_investido,
-                    cot.preco_fechamento as preco_atual,
-                    c.qtd * cot.preco_fechamento as valor_atual,
-                    (c.qtd * cot.preco_fechamento) - (c.qtd * c.preco_medio) as ganho_perda,
-                    ((cot.preco_fechamento - c.preco_medio) / c.preco_medio) * 100 as rentabilidade_pct
-                FROM carteira c
-                JOIN ativos a ON c.id_ativo = a.id
-                LEFT JOIN (
-                    SELECT DISTINCT ON (id_ativo) id_ativo, preco_fechamento
-                    FROM cotacoes
-                    ORDER BY id_ativo, data DESC
-                ) cot ON c.id_ativo = cot.id_ativo
-            """
-            
-            df = self.db.execute_query(query)
+            df = self.db.execute_prepared('carteira_alocacao')
             
             if df.empty:
                 print("ERRO: Carteira vazia")
@@ -222,28 +173,61 @@ class ReportsManager:
             logger.error(f"Erro ao gerar dashboard de alocacao: {e}")
             return None
     
-    def resumo_sistema(self):
-        """Gera resumo do sistema"""
+    def exportar_cotacoes(self, caminho, data_inicio=None, data_fim=None):
+        """Exporta o historico de cotacoes para CSV em lotes (memoria constante)"""
         try:
+            # Sem periodo: todo o historico (datas extremas das estatisticas, sem varrer cotacoes)
+            if data_inicio is None or data_fim is None:
+                estatisticas = self.db.get_estatisticas()
+                data_inicio = data_inicio or estatisticas['data_min'] or date.today()
+                data_fim = data_fim or estatisticas['data_max'] or date.today()
+            
+            total = 0
+            with open(caminho, 'w', encoding='utf-8', newline='') as arquivo:
+                lotes = self.db.iter_query(sql('exportar_cotacoes'), (data_inicio, data_fim))
+                for numero, df in enumerate(lotes):
+                    df.to_csv(arquivo, index=False, header=(numero == 0), date_format='%Y-%m-%d')
+                    total += len(df)
+            
+            print(f"\nEXPORTACAO DE COTACOES")
+            print(f"Periodo: {data_inicio} a {data_fim} | Registros: {total}")
+            print(f"Arquivo: {caminho}")
+            return total
+            
+        except Exception as e:
+            logger.error(f"Erro ao exportar cotacoes: {e}")
+            return None
+    
+    def resumo_sistema(self, modo=None):
+        """Gera resumo do sistema (contadores mantidos pela ingestao ou estimativa do catalogo)"""
+        try:
+            estatisticas = self.db.get_estatisticas(modo)
+            
             print("\nRESUMO DO SISTEMA")
             print("=" * 50)
             
-            # Contar registros por tabela
-            tabelas = ['ativos', 'cotacoes', 'dividendos']
-            
-            for tabela in tabelas:
-                count = self.db.get_table_count(tabela)
-                print(f"{tabela:12s}: {count:6d} registros")
-            
-            # Data mais recente de cotacoes
-            try:
-                query = "SELECT MAX(data) as ultima_data FROM cotacoes"
-                result = self.db.execute_query(query)
-                if not result.empty and result['ultima_data'].iloc[0] is not None:
-                    ultima_data = result['ultima_data'].iloc[0]
-                    print(f"\nUltima cotacao: {ultima_data}")
-            except:
+            # Registros e tamanhos por tabela, sem COUNT(*)
+            rotulo = 'registros' if estatisticas['modo'] == 'exato' else 'registros (estimativa)'
+            for tabela, row in estatisticas['tabelas'].iterrows():
+                print(f"{tabela:12s}: {int(row['registros']):10,d} {rotulo} | "
+                      f"tabela {row['tamanho_tabela'] / 1024 ** 2:8.1f} MB | "
+                      f"indices {row['tamanho_indices'] / 1024 ** 2:8.1f} MB")
+            
+            # Periodo e cotacoes por ano (agregado por pregao)
+            if estatisticas['data_max'] is not None:
+                print(f"\nPrimeira cotacao: {estatisticas['data_min']}")
+                print(f"Ultima cotacao: {estatisticas['data_max']}")
+                print("\nCotacoes por ano:")
+                for _, row in estatisticas['por_ano'].iterrows():
+                    print(f"{int(row['ano'])}: {int(row['registros']):10,d}")
+            else:
                 print("\nUltima cotacao: Nao disponivel")
             
+            # Consultas dos relatorios que mais consomem tempo do banco neste processo
+            self.db.preparadas.imprimir_metricas()
+            
+            return estatisticas
+            
         except Exception as e:
             logger.error(f"Erro ao gerar resumo do sistema: {e}")
+            return None
@@ -103,7 +103,8 @@ class ReportsWorkflow:
         logger.info("=== EXECUTANDO RESUMO DO SISTEMA ===")
         
         try:
-            self.reports_manager.resumo_sistema()
+            if self.reports_manager.resumo_sistema() is None:
+                return False
             logger.info("Resumo do sistema concluido")
             return True
         except Exception as e:
@@ -4,9 +4,12 @@ create table ativos
   codigo varchar(12) not null unique,
   nome varchar(120),
   tipo varchar(20),
-  setor varchar(80)
+  setor varchar(80),
+  regras_versao varchar(16)
 );
 
+-- Layout plano; com PARTICIONAMENTO_CONFIG['cotacoes_por_mes'] a tabela vira particionada por mes
+-- (range em data) na criacao, ou depois com: python main.py --particionar-cotacoes
 create table cotacoes
 (
   id bigserial primary key,
@@ -31,3 +34,52 @@ create table dividendos
   unique (id_ativo, data)
 );
 
+-- Ultima cotacao de cada ativo (dashboard, graficos e Power BI); mantida pela ingestao
+create table cotacoes_ultima
+(
+  id_ativo int primary key references ativos(id) on delete cascade,
+  data date not null,
+  preco_abertura numeric(18,4),
+  preco_fechamento numeric(18,4),
+  maximo numeric(18,4),
+  minimo numeric(18,4),
+  negocios int,
+  volume_financeiro numeric(20,2)
+);
+
+-- Contadores exatos (ativos, dividendos) e linhas de cotacoes por pregao; mantidos pela ingestao
+create table estatisticas_tabelas
+(
+  tabela varchar(40) primary key,
+  registros bigint not null default 0,
+  atualizado_em timestamptz not null default now()
+);
+
+insert into estatisticas_tabelas (tabela, registros) values ('ativos', 0), ('dividendos', 0);
+
+create table cotacoes_pregoes
+(
+  data date primary key,
+  registros int not null
+);
+
+-- Substituicao de pregoes (DELETE por data) e consultas por intervalo de datas
+create index cotacoes_data_idx on cotacoes (data);
+
+-- Perfil de indices dos relatorios (ultima cotacao por ativo e intervalos de datas)
+create index cotacoes_ativo_data_desc_idx on cotacoes (id_ativo, data desc) include (preco_fechamento);
+create index cotacoes_data_brin on cotacoes using brin (data);
+create index dividendos_data_idx on dividendos (data);
+
+-- Staging da carga em massa (COPY) de cotacoes; sem WAL e sem indices
+create unlogged table cotacoes_staging
+(
+  id_ativo int,
+  data date,
+  preco_abertura numeric(18,4),
+  preco_fechamento numeric(18,4),
+  maximo numeric(18,4),
+  minimo numeric(18,4),
+  negocios int,
+  volume_financeiro numeric(20,2)
+);
@@ -0,0 +1,5 @@
+# Os modulos do projeto ficam na raiz do repositorio (sem pacote instalavel)
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
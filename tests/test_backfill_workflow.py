@@ -0,0 +1,36 @@
+# ====================================
+# TESTES: MANIFESTO DO BACKFILL
+# ====================================
+
+from datetime import date
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("sqlalchemy")
+
+from backfill_workflow import ManifestoBackfill
+
+
+def test_reexecutar_subintervalo_mantem_ano_coberto(tmp_path):
+    manifesto = ManifestoBackfill(str(tmp_path / 'manifesto.json'))
+    manifesto.concluir(2020, date(2020, 1, 1), date(2020, 12, 31), ['2020-01-02', '2020-12-30'], 100)
+
+    # Reexecucao de marco, ja coberto pelo ano inteiro
+    manifesto.concluir(2020, date(2020, 3, 1), date(2020, 3, 31), ['2020-03-02'], 10)
+
+    entrada = ManifestoBackfill(str(tmp_path / 'manifesto.json')).anos['2020']
+    assert entrada['inicio'] == '2020-01-01'
+    assert entrada['fim'] == '2020-12-31'
+    assert entrada['datas'] == ['2020-01-02', '2020-03-02', '2020-12-30']
+    assert manifesto.pendente(2020, date(2020, 1, 1), date(2020, 12, 31)) is None
+
+
+def test_intervalo_disjunto_nao_e_unido(tmp_path):
+    manifesto = ManifestoBackfill(str(tmp_path / 'manifesto.json'))
+    manifesto.concluir(2020, date(2020, 6, 1), date(2020, 6, 30), ['2020-06-01'], 5)
+    manifesto.concluir(2020, date(2020, 1, 1), date(2020, 1, 31), ['2020-01-02'], 3)
+
+    entrada = manifesto.anos['2020']
+    assert (entrada['inicio'], entrada['fim']) == ('2020-01-01', '2020-01-31')
+    assert manifesto.pendente(2020, date(2020, 1, 1), date(2020, 6, 30)) == (date(2020, 2, 1), date(2020, 6, 30))
@@ -0,0 +1,26 @@
+# ====================================
+# TESTES: CAMINHO TIPADO (COPY) DO DATABASE MANAGER
+# ====================================
+
+from io import BytesIO
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("sqlalchemy")
+
+from database_manager import TIPOS_COLUNAS, ler_csv_tipado
+
+
+def test_copy_com_inteiro_nulo_vira_na():
+    # LEFT JOIN sem cotacao: id_ativo, ano e mes vem vazios (NULL) no CSV do COPY
+    buffer = BytesIO(b"codigo,id_ativo,ano,mes,data\nPETR4,1,2024,3,2024-03-01\nXXXX3,,,,\n")
+
+    df = ler_csv_tipado(buffer, TIPOS_COLUNAS)
+
+    assert str(df['id_ativo'].dtype) == 'Int32'
+    assert str(df['ano'].dtype) == 'Int32'
+    assert df['id_ativo'].tolist()[0] == 1
+    assert df['id_ativo'].isna().tolist() == [False, True]
+    assert df['mes'].isna().tolist() == [False, True]
+    assert df['data'].isna().tolist() == [False, True]
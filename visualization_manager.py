@@ -2,9 +2,10 @@
 # MODULO: VISUALIZACOES E GRAFICOS
 # ====================================
 
-import pandas as pd
 import logging
+from datetime import date, timedelta
 from database_manager import DatabaseManager
+from consultas_relatorios import consulta_dividendos
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -23,17 +24,9 @@ class VisualizationManager:
             import plotly.graph_objects as go
             from plotly.subplots import make_subplots
             
-            query = """
-                SELECT c.data, c.preco_abertura, c.preco_fechamento, 
-                       c.maximo, c.minimo, c.volume_financeiro, a.nome
-                FROM cotacoes c
-                JOIN ativos a ON c.id_ativo = a.id
-                WHERE a.codigo = %s
-                AND c.data >= CURRENT_DATE - INTERVAL '%s days'
-                ORDER BY c.data
-            """
-            
-            df = self.db.execute_query(query, [codigo_ativo, periodo_dias])
+            # Data inicial como parametro date: poda de particoes no plano
+            data_inicio = date.today() - timedelta(days=int(periodo_dias))
+            df = self.db.execute_tipado('historico_cotacoes', (codigo_ativo, data_inicio))
             
             if df.empty:
                 logger.warning(f"Nenhum dado encontrado para {codigo_ativo}")
@@ -96,23 +89,7 @@ class VisualizationManager:
         try:
             import plotly.express as px
             
-            query = """
-                SELECT 
-                    a.codigo, a.nome, a.tipo, a.setor,
-                    c.qtd, c.preco_medio,
-                    c.qtd * c.preco_medio as valor_investido,
-                    cot.preco_fechamento as preco_atual,
-                    c.qtd * cot.preco_fechamento as valor_atual
-                FROM carteira c
-                JOIN ativos a ON c.id_ativo = a.id
-                LEFT JOIN (
-                    SELECT DISTINCT ON (id_ativo) id_ativo, preco_fechamento
-                    FROM cotacoes
-                    ORDER BY id_ativo, data DESC
-                ) cot ON c.id_ativo = cot.id_ativo
-            """
-            
-            df = self.db.execute_query(query)
+            df = self.db.execute_prepared('carteira_alocacao')
             
             if df.empty:
                 logger.warning("Carteira vazia")
@@ -174,27 +151,7 @@ class VisualizationManager:
         try:
             import plotly.express as px
             
-            query = """
-                SELECT a.codigo, a.nome, d.data, d.valor, d.tipo,
-                       EXTRACT(YEAR FROM d.data) as ano,
-                       EXTRACT(MONTH FROM d.data) as mes
-                FROM dividendos d
-                JOIN ativos a ON d.id_ativo = a.id
-                WHERE 1=1
-            """
-            params = []
-            
-            if codigo_ativo:
-                query += " AND a.codigo = %s"
-                params.append(codigo_ativo)
-            
-            if ano:
-                query += " AND EXTRACT(YEAR FROM d.data) = %s"
-                params.append(ano)
-            
-            query += " ORDER BY d.data"
-            
-            df = self.db.execute_query(query, params)
+            df = self.db.execute_tipado(*consulta_dividendos(codigo_ativo, ano))
             
             if df.empty:
                 logger.warning("Nenhum dividendo encontrado")